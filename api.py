@@ -1,17 +1,156 @@
-from fastapi import FastAPI, UploadFile, File, Query
-from fastapi.responses import JSONResponse
+import asyncio, csv, io, json, time
+from contextlib import asynccontextmanager, suppress
+from typing import List, Optional
+from fastapi import FastAPI, UploadFile, File, Query, Request, Header, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-import numpy as np, cv2, uvicorn
+import uvicorn
+
+from utils.config import (RECOGNITION_POOL, RECOGNITION_WORKERS, RECOGNITION_QUEUE_SIZE, RECOGNITION_THRESHOLD,
+                          WS_ATTENDANCE_COOLDOWN, MAX_UPLOAD_BYTES, MAX_REQUEST_BYTES,
+                          ATTENDANCE_PAGE_SIZE, ATTENDANCE_MAX_PAGE_SIZE)
+from utils.data_manager import (update_attendance_record, query_attendance, attendance_rollup, attendance_rates,
+                                rebuild_rollups)
+from utils.logger import log_message
+from utils.metrics import metrics
+from utils.recognition import recognize_payloads, track_frame, RAW_HEADER, RAW_MAGIC
+from utils.tracker import FaceTracker
+from utils.registry import student_registry
+from utils.storage import decode_cursor
+from utils.workers import BoundedExecutor, QueueFullError
+
+recognition_pool = BoundedExecutor("recognition", RECOGNITION_WORKERS, RECOGNITION_QUEUE_SIZE, RECOGNITION_POOL)
+# A single storage worker keeps CSV writes ordered without locking
+storage_pool = BoundedExecutor("storage", 1, RECOGNITION_QUEUE_SIZE)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    yield
+    recognition_pool.shutdown()
+    storage_pool.shutdown()
 
-from utils.face_utils import predict_student
-from utils.data_manager import update_attendance_record, load_students
 
 app = FastAPI(
     title="Face Recognition & Attendance API",
     description="API to predict students and update attendance",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
+def format_size(size):
+    for unit, scale in (("MB", 1 << 20), ("KB", 1 << 10)):
+        if size >= scale:
+            return f"{size / scale:.4g} {unit}"
+    return f"{size} bytes"
+
+
+class PayloadTooLargeError(Exception):
+    def __init__(self, limit, what="Payload"):
+        super().__init__(f"{what} too large, maximum is {format_size(limit)}")
+        self.limit = limit
+
+
+class MultipartMeter:
+    """Counts the bytes of each part of a multipart body as it streams in."""
+
+    def __init__(self, boundary: bytes):
+        self.delimiter = b"--" + boundary
+        self.tail = b""
+        self.part = 0
+        self.largest = 0
+
+    def feed(self, chunk: bytes):
+        data = self.tail + chunk
+        counted = len(self.tail)
+        pos = data.find(self.delimiter)
+        while pos >= 0:
+            self.part += max(0, pos - counted)
+            self.largest = max(self.largest, self.part)
+            self.part, counted = 0, pos + len(self.delimiter)
+            pos = data.find(self.delimiter, counted)
+        self.part += len(data) - counted
+        self.largest = max(self.largest, self.part)
+        # Keep enough to find a delimiter split across two chunks
+        self.tail = data[-(len(self.delimiter) - 1):]
+        return self.largest
+
+
+def multipart_boundary(headers):
+    content_type = headers.get(b"content-type", b"")
+    if not content_type.startswith(b"multipart/"):
+        return None
+    for param in content_type.split(b";")[1:]:
+        key, _, value = param.strip().partition(b"=")
+        if key.lower() == b"boundary" and value:
+            return value.strip(b'"')
+    return None
+
+
+class BodySizeLimitMiddleware:
+    """Rejects request bodies over `max_bytes`, and multipart parts over `max_part_bytes`, with 413 while they stream in.
+
+    A declared Content-Length is checked before anything is read; otherwise the bytes
+    are counted as the app receives them and the request is cut off at the limit. Form
+    parsing turns any error into a 400, so once a limit is hit the app's own response
+    is discarded and the 413 is sent from here.
+    """
+
+    # Room for the headers of one multipart part on top of the file itself
+    PART_HEADER_BYTES = 16 * 1024
+
+    def __init__(self, app, max_bytes=MAX_REQUEST_BYTES, max_part_bytes=MAX_UPLOAD_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+        self.max_part_bytes = max_part_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope["headers"])
+        length = headers.get(b"content-length")
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            return await self.too_large(PayloadTooLargeError(self.max_bytes), scope, receive, send)
+
+        boundary = multipart_boundary(headers)
+        meter = MultipartMeter(boundary) if boundary else None
+        received, started, exceeded = 0, False, None
+
+        async def limited_receive():
+            nonlocal received, exceeded
+            message = await receive()
+            if message["type"] == "http.request":
+                body = message.get("body", b"")
+                received += len(body)
+                if received > self.max_bytes:
+                    exceeded = PayloadTooLargeError(self.max_bytes)
+                elif meter and meter.feed(body) > self.max_part_bytes + self.PART_HEADER_BYTES:
+                    exceeded = PayloadTooLargeError(self.max_part_bytes, "Uploaded file")
+                if exceeded:
+                    raise exceeded
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if exceeded:
+                return
+            started = started or message["type"] == "http.response.start"
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except PayloadTooLargeError:
+            pass
+        if exceeded and not started:
+            await self.too_large(exceeded, scope, receive, send)
+
+    @staticmethod
+    async def too_large(error, scope, receive, send):
+        await JSONResponse({"success": False, "error": str(error)}, status_code=413)(scope, receive, send)
+
+
+app.add_middleware(BodySizeLimitMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -20,30 +159,110 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+MAX_BATCH_SIZE = 64
+
+
+async def read_limited(image: UploadFile, limit=MAX_UPLOAD_BYTES, chunk_size=1 << 16):
+    """Read one upload in chunks, giving up as soon as it passes `limit` bytes."""
+    chunks, size = [], 0
+    while True:
+        chunk = await image.read(chunk_size)
+        if not chunk:
+            return b"".join(chunks)
+        size += len(chunk)
+        if size > limit:
+            raise PayloadTooLargeError(limit, "Uploaded file")
+        chunks.append(chunk)
+
 
-async def decode_uploaded_image(image: UploadFile):
-    contents = await image.read()
-    np_img = np.frombuffer(contents, np.uint8)
-    return cv2.imdecode(np_img, cv2.IMREAD_GRAYSCALE)
+async def read_uploaded_images(images: List[UploadFile]):
+    return [await read_limited(image) for image in images]
 
 
 def error_response(message: str, status: int = 500):
     return JSONResponse({"success": False, "error": message}, status_code=status)
 
 
+def exception_response(e: Exception):
+    if isinstance(e, PayloadTooLargeError):
+        return error_response(str(e), 413)
+    if isinstance(e, QueueFullError):
+        return JSONResponse(
+            {"success": False, "error": str(e)}, status_code=429,
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    return error_response(str(e))
+
+
+def resolve_match(result, students):
+    """Turn a recognize_payloads result into (student, confidence) using the threshold."""
+    if not result["matches"]:
+        return None, None
+    label, confidence = result["matches"][0]
+    if confidence < RECOGNITION_THRESHOLD:
+        return students.get(str(label)), confidence
+    return None, confidence
+
+
+def match_response(result, students, top_k=1):
+    """Single-image response: the best match decides success, top_k > 1 adds every candidate with its own match flag."""
+    student, confidence = resolve_match(result, students)
+    body = {"success": student is not None, "student": student, "confidence": confidence}
+    if top_k > 1:
+        body["candidates"] = [
+            {"student": students[str(label)], "distance": distance, "match": distance < RECOGNITION_THRESHOLD}
+            for label, distance in result["matches"] if str(label) in students
+        ]
+    if student is None:
+        body["message"] = "No match found"
+        return JSONResponse(body, status_code=404)
+    return body
+
+
+def update_many(students, start_time, end_time):
+    return [update_attendance_record(student, start_time, end_time) for student in students]
+
+
 @app.post("/predict")
-async def predict(image: UploadFile = File(...)):
+async def predict(
+    image: UploadFile = File(...),
+    top_k: int = Query(1, ge=1, le=10, description="Number of candidate students to return")
+):
+    try:
+        payloads = await read_uploaded_images([image])
+        result = (await recognition_pool.run(recognize_payloads, payloads, top_k))[0]
+        students = await storage_pool.run(student_registry.students)
+        return match_response(result, students, top_k)
+
+    except Exception as e:
+        return exception_response(e)
+
+
+@app.post("/predict/raw")
+async def predict_raw(
+    request: Request,
+    width: int = Header(..., alias="X-Image-Width", ge=1, le=65535),
+    height: int = Header(..., alias="X-Image-Height", ge=1, le=65535),
+    top_k: int = Query(1, ge=1, le=10),
+):
+    """Body is width*height 8-bit grayscale pixels, no multipart and no image codec involved."""
     try:
-        img = await decode_uploaded_image(image)
-        students = load_students()
-        student, confidence = predict_student(img, students)
+        if width * height > MAX_UPLOAD_BYTES:
+            raise PayloadTooLargeError(MAX_UPLOAD_BYTES)
+        body = bytearray(RAW_HEADER.pack(RAW_MAGIC, width, height))
+        async for chunk in request.stream():
+            body += chunk
+            if len(body) - RAW_HEADER.size > width * height:
+                return error_response("Body is larger than X-Image-Width x X-Image-Height", 400)
+        if len(body) - RAW_HEADER.size != width * height:
+            return error_response("Body is smaller than X-Image-Width x X-Image-Height", 400)
 
-        if student:
-            return {"success": True, "student": student, "confidence": confidence}
-        return JSONResponse({"success": False, "message": "No match found"}, status_code=404)
+        result = (await recognition_pool.run(recognize_payloads, [bytes(body)], top_k))[0]
+        students = await storage_pool.run(student_registry.students)
+        return match_response(result, students, top_k)
 
     except Exception as e:
-        return error_response(str(e))
+        return exception_response(e)
 
 
 @app.post("/attendance/update")
@@ -53,13 +272,13 @@ async def attendance_update(
     end_time: str = Query(..., description="Allowed end time (HH:MM)")
 ):
     try:
-        students = load_students()
+        students = await storage_pool.run(student_registry.students)
         student = students.get(student_id)
 
         if not student:
             return JSONResponse({"success": False, "message": "Student not found"}, status_code=404)
 
-        updated, now = update_attendance_record(student, start_time, end_time)
+        updated, now = await storage_pool.run(update_attendance_record, student, start_time, end_time)
 
         if updated:
             return {
@@ -70,7 +289,7 @@ async def attendance_update(
         return {"success": False, "message": "Attendance not updated (outside time window or duplicate)"}
 
     except Exception as e:
-        return error_response(str(e))
+        return exception_response(e)
 
 
 @app.post("/recognize-and-update")
@@ -80,14 +299,15 @@ async def recognize_and_update(
     end_time: str = Query(..., description="Allowed end time (HH:MM)")
 ):
     try:
-        img = await decode_uploaded_image(image)
-        students = load_students()
-        student, confidence = predict_student(img, students)
+        payloads = await read_uploaded_images([image])
+        result = (await recognition_pool.run(recognize_payloads, payloads))[0]
+        students = await storage_pool.run(student_registry.students)
+        student, confidence = resolve_match(result, students)
 
         if not student:
             return JSONResponse({"success": False, "message": "No match found"}, status_code=404)
 
-        updated, now = update_attendance_record(student, start_time, end_time)
+        updated, now = await storage_pool.run(update_attendance_record, student, start_time, end_time)
 
         return {
             "success": True,
@@ -98,16 +318,339 @@ async def recognize_and_update(
         }
 
     except Exception as e:
-        return error_response(str(e))
+        return exception_response(e)
+
+
+@app.post("/predict/batch")
+async def predict_batch(images: List[UploadFile] = File(...)):
+    if len(images) > MAX_BATCH_SIZE:
+        return error_response(f"Too many images, maximum is {MAX_BATCH_SIZE}", 413)
+    try:
+        payloads = await read_uploaded_images(images)
+        recognized = await recognition_pool.run(recognize_payloads, payloads)
+        students = await storage_pool.run(student_registry.students)
+
+        results = []
+        for i, (image, result) in enumerate(zip(images, recognized)):
+            entry = {"index": i, "filename": image.filename}
+            student, confidence = resolve_match(result, students)
+            if not result["decoded"]:
+                entry.update(success=False, message="Invalid image")
+            elif student:
+                entry.update(success=True, student=student, confidence=confidence)
+            else:
+                entry.update(success=False, message="No match found")
+            results.append(entry)
+
+        return {"success": True, "count": len(results), "results": results}
+
+    except Exception as e:
+        return exception_response(e)
+
+
+@app.post("/recognize-and-update/batch")
+async def recognize_and_update_batch(
+    images: List[UploadFile] = File(...),
+    start_time: str = Query(..., description="Allowed start time (HH:MM)"),
+    end_time: str = Query(..., description="Allowed end time (HH:MM)")
+):
+    if len(images) > MAX_BATCH_SIZE:
+        return error_response(f"Too many images, maximum is {MAX_BATCH_SIZE}", 413)
+    try:
+        payloads = await read_uploaded_images(images)
+        recognized = await recognition_pool.run(recognize_payloads, payloads)
+        students = await storage_pool.run(student_registry.students)
+        matched = [resolve_match(result, students) for result in recognized]
+
+        hits = [student for student, _ in matched if student]
+        updates = iter(await storage_pool.run(update_many, hits, start_time, end_time))
+
+        results = []
+        for i, (image, result, (student, confidence)) in enumerate(zip(images, recognized, matched)):
+            entry = {"index": i, "filename": image.filename}
+            if not result["decoded"]:
+                entry.update(success=False, message="Invalid image")
+            elif not student:
+                entry.update(success=False, message="No match found")
+            else:
+                updated, now = next(updates)
+                entry.update(
+                    success=True, student=student, confidence=confidence,
+                    attendance_updated=updated, timestamp=now.strftime("%Y-%m-%d %H:%M:%S")
+                )
+            results.append(entry)
+
+        return {"success": True, "count": len(results), "results": results}
+
+    except Exception as e:
+        return exception_response(e)
+
+
+class RecognitionSession:
+    """State of one /ws/recognize connection: the newest unprocessed frame, the face tracker and attendance cooldowns."""
+
+    def __init__(self, websocket, start_time, end_time, top_k):
+        self.websocket = websocket
+        self.start_time = start_time
+        self.end_time = end_time
+        self.top_k = top_k
+        self.tracker = FaceTracker()
+        self.last_attendance = {}
+        self.latest = None
+        self.frame_seq = 0
+        self.received = 0
+        self.dropped = 0
+        self.arrived = asyncio.Event()
+        self.closed = False
+
+    async def receive(self):
+        try:
+            while True:
+                message = await self.websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes"):
+                    # Keep only the newest frame, whatever the processor has not picked up is stale
+                    self.received += 1
+                    if self.latest is not None:
+                        self.dropped += 1
+                    self.latest = (self.received, message["bytes"])
+                    self.arrived.set()
+                elif message.get("text") == "ping":
+                    await self.websocket.send_json({"type": "pong"})
+        finally:
+            self.closed = True
+            self.arrived.set()
+
+    async def process(self):
+        try:
+            while True:
+                await self.arrived.wait()
+                self.arrived.clear()
+                if self.closed:
+                    return
+                if self.latest is None:
+                    continue
+                seq, data = self.latest
+                self.latest = None
+                await self.process_frame(seq, data)
+        except WebSocketDisconnect:
+            # Client went away while an event was being sent
+            pass
+        except Exception as e:
+            if self.closed:
+                return
+            # Never leave the socket answering pings without a processor behind it
+            log_message(f"❌ /ws/recognize processor stopped: {e}", level="ERROR")
+            with suppress(Exception):
+                await self.websocket.close(code=1011)
+
+    async def process_frame(self, seq, data):
+        try:
+            self.tracker, faces = await recognition_pool.run(track_frame, data, self.tracker, self.top_k)
+            if faces is None:
+                await self.websocket.send_json({"type": "error", "frame": seq, "message": "Invalid image"})
+                return
+            students = await storage_pool.run(student_registry.students)
+            await self.publish(seq, faces, students)
+        except QueueFullError as e:
+            self.dropped += 1
+            await self.websocket.send_json({"type": "busy", "frame": seq, "retry_after": e.retry_after})
+        except (WebSocketDisconnect, RuntimeError):
+            raise
+        except Exception as e:
+            # No model trained yet, a codec error on a bad frame...: report it and keep serving the next frames
+            log_message(f"❌ /ws/recognize frame {seq} failed: {e}", level="ERROR")
+            await self.websocket.send_json({"type": "error", "frame": seq, "message": str(e)})
+
+    async def publish(self, seq, faces, students):
+        for face in faces:
+            student = students.get(face["label"]) if face["label"] else None
+            face["student"] = {"id": student["id"], "nama": student["nama"]} if student else None
+
+        await self.websocket.send_json({"type": "frame", "frame": seq, "dropped": self.dropped, "faces": faces})
+
+        for face in faces:
+            student = students.get(face["label"]) if face["label"] else None
+            if face["changed"]:
+                await self.websocket.send_json({
+                    "type": "recognized", "frame": seq, "track": face["track"],
+                    "student": student, "confidence": face["confidence"],
+                })
+            if student and face["recognized"]:
+                await self.mark_attendance(seq, student, face)
+
+    async def mark_attendance(self, seq, student, face):
+        if not (self.start_time and self.end_time):
+            return
+        now = time.monotonic()
+        if now - self.last_attendance.get(student["id"], -WS_ATTENDANCE_COOLDOWN) < WS_ATTENDANCE_COOLDOWN:
+            return
+        self.last_attendance[student["id"]] = now
+
+        try:
+            updated, at = await storage_pool.run(update_attendance_record, student, self.start_time, self.end_time)
+        except Exception:
+            # Not written, let the next sighting try again
+            del self.last_attendance[student["id"]]
+            raise
+        if updated:
+            await self.websocket.send_json({
+                "type": "attendance", "frame": seq, "track": face["track"], "student": student,
+                "confidence": face["confidence"], "timestamp": at.strftime("%Y-%m-%d %H:%M:%S"),
+            })
+
+
+@app.websocket("/ws/recognize")
+async def ws_recognize(
+    websocket: WebSocket,
+    start_time: Optional[str] = Query(None, description="Allowed start time (HH:MM), enables attendance updates"),
+    end_time: Optional[str] = Query(None, description="Allowed end time (HH:MM)"),
+    top_k: int = Query(1, ge=1, le=10),
+):
+    """Stream of encoded frames in, recognition and attendance events out.
+
+    Binary messages are frames; when the server falls behind only the newest frame is
+    processed. Every processed frame answers with a "frame" message, plus "recognized"
+    when a tracked face changes identity and "attendance" when a record is written.
+    """
+    await websocket.accept()
+    session = RecognitionSession(websocket, start_time, end_time, top_k)
+    processor = asyncio.create_task(session.process())
+    try:
+        await session.receive()
+    except (WebSocketDisconnect, RuntimeError):
+        # Client went away while an event was being sent
+        pass
+    finally:
+        session.closed = True
+        session.arrived.set()
+    try:
+        await processor
+    except Exception as e:
+        log_message(f"❌ /ws/recognize session ended with an error: {e}", level="ERROR")
+
+
+@app.get("/queue")
+async def queue_stats():
+    return {"success": True, "recognition": recognition_pool.stats(), "storage": storage_pool.stats()}
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def prometheus_metrics():
+    pools = {"recognition": recognition_pool.stats(), "storage": storage_pool.stats()}
+    gauges = {
+        f"face_pool_{field}": {(("pool", name),): stats[field] for name, stats in pools.items()}
+        for field in ("in_flight", "queued", "completed", "rejected", "failed")
+    }
+    return PlainTextResponse(metrics.render_prometheus(gauges), media_type="text/plain; version=0.0.4")
+
+
+ATTENDANCE_FIELDS = ["seq", "id", "name", "kelas", "timestamp", "status"]
+
+
+async def attendance_pages(filters, cursor, limit):
+    # Pages come from the storage worker one at a time, so an export never holds the whole history
+    while True:
+        rows, cursor = await storage_pool.run(query_attendance, cursor=cursor, limit=limit, **filters)
+        if rows:
+            yield rows
+        if cursor is None:
+            return
+
+
+async def csv_export(pages):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, ATTENDANCE_FIELDS)
+    writer.writeheader()
+    async for rows in pages:
+        writer.writerows(rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+async def ndjson_export(pages):
+    async for rows in pages:
+        yield "".join(json.dumps(row, default=str) + "\n" for row in rows)
+
+
+@app.get("/attendance")
+async def get_attendance(
+    student_id: Optional[int] = Query(None),
+    kelas: Optional[str] = Query(None),
+    start: Optional[str] = Query(None, description="Inclusive, 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS'"),
+    end: Optional[str] = Query(None, description="Exclusive, 'YYYY-MM-DD' or 'YYYY-MM-DD HH:MM:SS'"),
+    cursor: Optional[str] = Query(None, description="next_cursor of the previous page"),
+    limit: int = Query(ATTENDANCE_PAGE_SIZE, ge=1, le=ATTENDANCE_MAX_PAGE_SIZE),
+    format: str = Query("json", pattern="^(json|csv|ndjson)$"),
+):
+    filters = {"student_id": student_id, "kelas": kelas, "start": start, "end": end}
+    try:
+        if format == "json":
+            rows, next_cursor = await storage_pool.run(query_attendance, cursor=cursor, limit=limit, **filters)
+            return {"success": True, "count": len(rows), "items": rows, "next_cursor": next_cursor}
+
+        if cursor:
+            decode_cursor(cursor)  # fail with a 400 before the streaming response commits to a 200
+        pages = attendance_pages(filters, cursor, ATTENDANCE_MAX_PAGE_SIZE)
+        if format == "csv":
+            return StreamingResponse(csv_export(pages), media_type="text/csv",
+                                     headers={"Content-Disposition": "attachment; filename=attendance.csv"})
+        return StreamingResponse(ndjson_export(pages), media_type="application/x-ndjson")
+    except ValueError as e:
+        return error_response(str(e), 400)
+    except Exception as e:
+        return exception_response(e)
+
+
+@app.get("/reports/daily")
+async def daily_report(
+    by: str = Query("student", pattern="^(student|class)$"),
+    student_id: Optional[int] = Query(None),
+    kelas: Optional[str] = Query(None),
+    start: Optional[str] = Query(None, description="Inclusive day, 'YYYY-MM-DD'"),
+    end: Optional[str] = Query(None, description="Exclusive day, 'YYYY-MM-DD'"),
+):
+    try:
+        rows = await storage_pool.run(attendance_rollup, by, student_id, kelas, start, end)
+        return {"success": True, "count": len(rows), "items": rows}
+    except Exception as e:
+        return exception_response(e)
+
+
+@app.get("/reports/rates")
+async def rate_report(
+    by: str = Query("student", pattern="^(student|class)$"),
+    kelas: Optional[str] = Query(None),
+    start: Optional[str] = Query(None, description="Inclusive day, 'YYYY-MM-DD'"),
+    end: Optional[str] = Query(None, description="Exclusive day, 'YYYY-MM-DD'"),
+):
+    try:
+        sessions, rows = await storage_pool.run(attendance_rates, by, kelas, start, end)
+        return {"success": True, "session_days": sessions, "count": len(rows), "items": rows}
+    except Exception as e:
+        return exception_response(e)
+
+
+@app.post("/reports/rebuild")
+async def rebuild_reports():
+    try:
+        rows = await storage_pool.run(rebuild_rollups)
+        return {"success": True, "student_days": rows}
+    except Exception as e:
+        return exception_response(e)
 
 
 @app.get("/students")
 async def get_students():
     try:
-        students = load_students()
+        students = await storage_pool.run(student_registry.students)
         return {"success": True, "count": len(students), "students": students}
     except Exception as e:
-        return error_response(str(e))
+        return exception_response(e)
 
 
 if __name__ == "__main__":
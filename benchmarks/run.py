@@ -0,0 +1,331 @@
+"""Benchmark suite for recognition, training, storage and API throughput.
+
+Every population size runs in its own process inside a scratch directory with a
+fresh Data/ folder, so results do not depend on the local dataset or on module level
+singletons from an earlier size. Results are written as JSON for comparing commits:
+
+    python benchmarks/run.py --sizes 100,1000,10000 --images 3 --seed-image face.jpg --out bench.json
+
+Recognition and storage benchmarks use synthetic data only. Training and the API need
+images the Haar cascade can detect: they are generated from --seed-image (any photo
+with one frontal face) or, without it, from a drawn synthetic portrait.
+"""
+import argparse, itertools, json, os, platform, subprocess, sys, tempfile, time
+from datetime import datetime, timedelta
+
+import cv2, numpy as np, pandas as pd
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+QUERY_COUNT = 200
+BATCH_SIZE = 32
+
+
+def timed(fn, repeat=20, warmup=1):
+    """Run fn repeat times; latency stats in milliseconds."""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(1000 * (time.perf_counter() - start))
+    samples = np.array(samples)
+    return {
+        "repeat": repeat,
+        "mean_ms": round(float(samples.mean()), 3),
+        "p50_ms": round(float(np.percentile(samples, 50)), 3),
+        "p95_ms": round(float(np.percentile(samples, 95)), 3),
+        "min_ms": round(float(samples.min()), 3),
+    }
+
+
+def once(fn):
+    start = time.perf_counter()
+    result = fn()
+    return round(1000 * (time.perf_counter() - start), 3), result
+
+
+# ------------------------- synthetic data -------------------------
+
+
+def synth_face(rng, size=200):
+    """Smooth random texture the size of an aligned face crop."""
+    noise = rng.integers(0, 256, (size // 8, size // 8), dtype=np.uint8)
+    face = cv2.resize(noise, (size, size), interpolation=cv2.INTER_CUBIC)
+    return cv2.add(face, rng.integers(0, 24, (size, size), dtype=np.uint8))
+
+
+def synth_portrait(rng, size=320):
+    """Blurred drawing of a frontal face (oval, brows, eyes, nose, mouth) that the Haar cascade detects."""
+    img = np.full((size, size), 90, np.uint8)
+    c, u = size // 2, size / 100
+    cv2.ellipse(img, (c, c + 10), (int(30 * u), int(40 * u)), 0, 0, 360, 200, -1)
+    for side in (-1, 1):
+        eye = (c + side * int(12 * u), c - int(6 * u))
+        cv2.ellipse(img, (eye[0], eye[1] - int(7 * u)), (int(7 * u), int(1.5 * u)), 0, 0, 360, 70, -1)
+        cv2.ellipse(img, eye, (int(5.5 * u), int(3 * u)), 0, 0, 360, 40, -1)
+    cv2.ellipse(img, (c, c + int(8 * u)), (int(3 * u), int(6 * u)), 0, 0, 360, 160, -1)
+    cv2.ellipse(img, (c, c + int(20 * u)), (int(10 * u), int(2.5 * u)), 0, 0, 360, 60, -1)
+    img = cv2.GaussianBlur(img, (0, 0), u)
+    return cv2.add(img, rng.integers(0, 12, img.shape, dtype=np.uint8))
+
+
+def synth_histograms(rng, rows, params):
+    """Rows shaped like LBPH histograms (per-cell normalised); search cost only depends on the shape."""
+    cells, bins = params["grid_x"] * params["grid_y"], 2 ** params["neighbors"]
+    hist = rng.random((rows, cells, bins), dtype=np.float32) ** 4
+    hist /= hist.sum(axis=2, keepdims=True)
+    return hist.reshape(rows, cells * bins)
+
+
+def perturb(img, rng):
+    """Photometric and small geometric jitter that keeps a frontal face detectable."""
+    h, w = img.shape[:2]
+    out = np.clip(img.astype(np.float32) * rng.uniform(0.7, 1.2) + rng.normal(0, 8, img.shape), 0, 255).astype(np.uint8)
+    M = cv2.getRotationMatrix2D((w / 2, h / 2), rng.uniform(-8, 8), rng.uniform(0.9, 1.1))
+    M[:, 2] += rng.uniform(-0.04, 0.04, 2) * (w, h)
+    return cv2.warpAffine(out, M, (w, h), borderMode=cv2.BORDER_REFLECT)
+
+
+def synth_students(count, first_id=100000):
+    start = datetime(2025, 1, 1, 8, 0, 0)
+    return pd.DataFrame({
+        "id": np.arange(first_id, first_id + count),
+        "nama": [f"Student {i}" for i in range(count)],
+        "kelas": [("IPA", "IPS", "BHS")[i % 3] for i in range(count)],
+        "total_kehadiran": 0,
+        "email": "student@example.com",
+        "nomor_telepon": "0800000000",
+        "waktu_kehadiran": [(start + timedelta(minutes=i)).strftime("%Y-%m-%d %H:%M:%S") for i in range(count)],
+    })
+
+
+def attendance_events(students, count):
+    now = datetime(2025, 2, 1, 9, 0, 0)
+    rows = students.sample(n=count, replace=True, random_state=0).to_dict("records")
+    return [{"id": int(r["id"]), "nama": r["nama"], "timestamp": (now + timedelta(seconds=i)).strftime("%Y-%m-%d %H:%M:%S"),
+             "total_kehadiran": i + 1, "status": "Present"} for i, r in enumerate(rows)]
+
+
+# ------------------------- benchmarks -------------------------
+
+
+def bench_recognition(size, images, rng):
+    from utils.config import MODEL_BIN_PATH
+    from utils.face_utils import lbph_params, predict_student, predict_students
+    from utils.lbph_model import LBPHModel
+    from utils.model_store import face_model
+
+    params = lbph_params()
+    labels = np.repeat(np.arange(100000, 100000 + size, dtype=np.int32), images)
+    model = LBPHModel(synth_histograms(rng, len(labels), params), labels, **params)
+
+    save_ms, _ = once(lambda: model.save(MODEL_BIN_PATH))
+    queries = [synth_face(rng) for _ in range(QUERY_COUNT)]
+    students = {str(label): {"id": int(label), "nama": str(label)} for label in labels[::images]}
+    face_model.invalidate()
+    face_model.get()
+    it = itertools.count()
+
+    return {
+        "rows": int(len(labels)),
+        "model_bytes": os.path.getsize(MODEL_BIN_PATH),
+        "model_save_ms": save_ms,
+        "model_load_mmap": timed(lambda: LBPHModel.load(MODEL_BIN_PATH, mmap=True), repeat=10),
+        "model_load": timed(lambda: LBPHModel.load(MODEL_BIN_PATH, mmap=False), repeat=10),
+        "describe": timed(lambda: model.describe(queries[next(it) % QUERY_COUNT]), repeat=50),
+        "predict_single": timed(lambda: predict_student(queries[next(it) % QUERY_COUNT], students, aligned=True), repeat=QUERY_COUNT),
+        "predict_batch": dict(
+            timed(lambda: predict_students(queries[:BATCH_SIZE], students, aligned=True), repeat=10),
+            batch_size=BATCH_SIZE,
+        ),
+        "top_5": timed(lambda: model.top_k(queries[next(it) % QUERY_COUNT], 5), repeat=50),
+    }
+
+
+def bench_storage(size):
+    import utils.data_manager as data_manager
+    from utils.config import ATTENDANCE_PATH
+    from utils.storage import ATTENDANCE_COLUMNS, get_storage
+
+    # The CSV backend appends rows without a header
+    pd.DataFrame(columns=ATTENDANCE_COLUMNS).to_csv(ATTENDANCE_PATH, index=False)
+    students = synth_students(size)
+    events = attendance_events(students, 200)
+    results = {}
+
+    for backend in ("csv", "sqlite"):
+        data_manager.STORAGE_BACKEND = backend
+        write_ms, _ = once(lambda: data_manager.save_data(students))
+        index = data_manager.load_students()
+        one = next(iter(index.values()))
+
+        def record():
+            one["total_kehadiran"] = int(one["total_kehadiran"]) + 1
+            one["waktu_kehadiran"] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            data_manager.save_attendance(one)
+
+        seq = itertools.count(1)
+        results[backend] = {
+            "save_students_ms": write_ms,
+            "load_students": timed(data_manager.load_students, repeat=10),
+            "load_data": timed(data_manager.load_data, repeat=10),
+            "save_attendance": timed(record, repeat=100),
+            "apply_attendance_events_200": timed(lambda: data_manager.apply_attendance_events(events, next(seq)), repeat=5),
+        }
+        if backend == "sqlite":
+            results[backend]["students_version"] = timed(get_storage().students_version, repeat=100)
+
+    data_manager.STORAGE_BACKEND = "sqlite"
+    return results
+
+
+def write_enrollment(seed, student_ids, images, rng):
+    from utils.config import IMAGES_DIR
+    for student_id in student_ids:
+        folder = os.path.join(IMAGES_DIR, str(student_id))
+        os.makedirs(folder, exist_ok=True)
+        for i in range(images):
+            cv2.imwrite(os.path.join(folder, f"{student_id}_{i}.jpg"), perturb(seed, rng))
+
+
+def bench_training(seed, students, images, rng):
+    import shutil
+    from utils.config import FACE_CACHE_DIR
+    from utils.face_utils import train_model
+
+    write_enrollment(seed, range(100000, 100000 + students), images, rng)
+    shutil.rmtree(FACE_CACHE_DIR, ignore_errors=True)
+
+    full_cold_ms, _ = once(lambda: train_model(full=True))
+    full_warm_ms, _ = once(lambda: train_model(full=True))
+    unchanged_ms, _ = once(train_model)
+    write_enrollment(seed, [100000 + students], images, rng)
+    one_new_ms, _ = once(train_model)
+
+    return {
+        "students": students,
+        "images": students * images,
+        "full_cold_cache_ms": full_cold_ms,
+        "full_warm_cache_ms": full_warm_ms,
+        "incremental_unchanged_ms": unchanged_ms,
+        "incremental_one_new_student_ms": one_new_ms,
+    }
+
+
+def bench_api(seed, requests):
+    from fastapi.testclient import TestClient
+    import api
+
+    ok, buf = cv2.imencode(".jpg", seed)
+    payload = buf.tobytes()
+
+    def throughput(call, count):
+        start = time.perf_counter()
+        statuses = {}
+        for _ in range(count):
+            status = call().status_code
+            statuses[status] = statuses.get(status, 0) + 1
+        elapsed = time.perf_counter() - start
+        return {"requests": count, "req_per_s": round(count / elapsed, 2), "status_codes": statuses}
+
+    with TestClient(api.app) as client:
+        client.get("/students")
+        return {
+            "predict": throughput(lambda: client.post("/predict", files={"image": ("face.jpg", payload)}), requests),
+            "predict_batch_8": throughput(
+                lambda: client.post("/predict/batch", files=[("images", (f"{i}.jpg", payload)) for i in range(8)]),
+                max(1, requests // 8),
+            ),
+            "students": throughput(lambda: client.get("/students"), requests),
+        }
+
+
+def run_size(args):
+    """Runs inside the scratch directory of one population size; prints its results as JSON."""
+    sys.path.insert(0, REPO_ROOT)
+    rng = np.random.default_rng(args.seed)
+    seed = cv2.imread(args.seed_image, cv2.IMREAD_GRAYSCALE) if args.seed_image else None
+    if args.seed_image and seed is None:
+        raise SystemExit(f"Cannot read seed image {args.seed_image}")
+    if seed is None:
+        seed = synth_portrait(rng)
+
+    from utils.data_manager import save_data
+    result = {"size": args.worker_size, "images_per_student": args.images}
+    result["recognition"] = bench_recognition(args.worker_size, args.images, rng)
+    result["storage"] = bench_storage(args.worker_size)
+
+    result["seed_image"] = args.seed_image or "synthetic"
+    save_data(synth_students(args.worker_size))
+    result["training"] = bench_training(seed, min(args.worker_size, args.train_students), args.images, rng)
+    result["api"] = bench_api(seed, args.api_requests)
+
+    from utils.logger import flush_logs
+    flush_logs()
+    print(json.dumps(result))
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=REPO_ROOT, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", default="100,1000,10000", help="Comma separated student counts")
+    parser.add_argument("--images", type=int, default=3, help="Images per student")
+    parser.add_argument("--seed-image", help="Photo with one frontal face for training and API benchmarks (default: synthetic portrait)")
+    parser.add_argument("--train-students", type=int, default=100, help="Upper bound of students enrolled for training")
+    parser.add_argument("--api-requests", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench_output.json")
+    parser.add_argument("--worker-size", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker_size is not None:
+        run_size(args)
+        return
+
+    seed_image = os.path.abspath(args.seed_image) if args.seed_image else None
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "opencv": cv2.__version__,
+            "numpy": np.__version__,
+            "args": vars(args),
+        },
+        "results": [],
+    }
+
+    for size in [int(s) for s in args.sizes.split(",") if s]:
+        print(f"Benchmarking {size} students...", file=sys.stderr)
+        with tempfile.TemporaryDirectory(prefix="face-bench-") as workdir:
+            os.makedirs(os.path.join(workdir, "Data"))
+            with open(os.path.join(workdir, "Data", "config.json"), "w") as f:
+                json.dump({"storage_backend": "sqlite"}, f)
+
+            cmd = [sys.executable, os.path.abspath(__file__), "--worker-size", str(size), "--images", str(args.images),
+                   "--train-students", str(args.train_students), "--api-requests", str(args.api_requests),
+                   "--seed", str(args.seed)]
+            if seed_image:
+                cmd += ["--seed-image", seed_image]
+            proc = subprocess.run(cmd, cwd=workdir, capture_output=True, text=True)
+            if proc.returncode != 0:
+                print(proc.stderr, file=sys.stderr)
+                raise SystemExit(f"Benchmark for {size} students failed")
+            report["results"].append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
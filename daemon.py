@@ -0,0 +1,169 @@
+import argparse, multiprocessing as mp, queue, signal, time
+import cv2, numpy as np
+
+from utils.config import DAEMON_REPORT_INTERVAL, SNAPSHOT_MARGIN
+from utils.data_manager import update_attendance_record
+from utils.face_pipeline import FaceDetector
+from utils.face_utils import predict_students
+from utils.journal import AttendanceJournal
+from utils.logger import log_message, flush_logs
+from utils.registry import student_registry
+from utils.snapshots import snapshot_writer
+from utils.tracker import FaceTracker
+
+
+def open_source(source):
+    # Device index, RTSP/HTTP URL or video file
+    return cv2.VideoCapture(int(source) if str(source).isdigit() else source)
+
+
+def run_source(name, source, events, stop, loop=False, report_interval=DAEMON_REPORT_INTERVAL):
+    """Worker process: read one source, detect, track and recognize, and report to the parent.
+
+    Attendance is never written here; a recognized face is sent to the parent, which
+    owns the single attendance writer. The model file is memory-mapped, so every worker
+    shares the same pages of the loaded model.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    cv2.setNumThreads(1)
+    cap = open_source(source)
+    if not cap.isOpened():
+        events.put(("error", name, f"Cannot open source {source}"))
+        events.put(("done", name, None))
+        return
+
+    detector, tracker = FaceDetector(), FaceTracker()
+    frames, latencies, last_report = 0, [], time.monotonic()
+
+    try:
+        while not stop.is_set():
+            ret, frame = cap.read()
+            if not ret:
+                if loop and cap.set(cv2.CAP_PROP_POS_FRAMES, 0):
+                    continue
+                break
+
+            start = time.perf_counter()
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            tracks = tracker.update(detector.detect(gray))
+            pending = [t for t in tracks if tracker.needs_recognition(t)]
+            results = predict_students([gray[y:y+h, x:x+w] for (x, y, w, h) in (t.box for t in pending)],
+                                       student_registry.students(), aligned=True)
+            for track, (student, conf) in zip(pending, results):
+                track.set_identity(student, conf)
+                if student:
+                    x, y, w, h = track.box
+                    m = SNAPSHOT_MARGIN
+                    # Send the snapshot region along, the parent only saves it if attendance is written
+                    crop = frame[max(0, y - m):y + h + m, max(0, x - m):x + w + m].copy()
+                    events.put(("seen", name, (str(student["id"]), conf, crop)))
+
+            frames += 1
+            latencies.append(time.perf_counter() - start)
+            now = time.monotonic()
+            if now - last_report >= report_interval:
+                lat = np.array(latencies) * 1000
+                events.put(("stats", name, {
+                    "fps": frames / (now - last_report), "frames": frames, "tracks": len(tracker.tracks),
+                    "latency_ms": float(lat.mean()), "p95_ms": float(np.percentile(lat, 95)),
+                }))
+                frames, latencies, last_report = 0, [], now
+    finally:
+        cap.release()
+        events.put(("done", name, None))
+
+
+class AttendanceDaemon:
+    """Runs one worker process per source and applies their attendance through one journal."""
+
+    def __init__(self, sources, start_time, end_time, loop=False, report_interval=DAEMON_REPORT_INTERVAL):
+        self.sources = {f"src{i}": source for i, source in enumerate(sources)}
+        self.start_time = start_time
+        self.end_time = end_time
+        self.loop = loop
+        self.report_interval = report_interval
+        ctx = mp.get_context("spawn")
+        self.events = ctx.Queue(maxsize=1024)
+        self.stop = ctx.Event()
+        self.workers = {
+            name: ctx.Process(target=run_source, name=name, daemon=True,
+                              args=(name, source, self.events, self.stop, loop, report_interval))
+            for name, source in self.sources.items()
+        }
+        self.journal = None
+        self.recorded = 0
+
+    def request_stop(self, *_):
+        if not self.stop.is_set():
+            log_message("🛑 Stopping sources...")
+        self.stop.set()
+
+    def handle(self, kind, name, payload):
+        if kind == "seen":
+            student_id, conf, crop = payload
+            # The registry follows students and attendance written by other processes
+            student = student_registry.get(student_id)
+            if not student:
+                return
+            updated, now = update_attendance_record(student, self.start_time, self.end_time, journal=self.journal)
+            if updated:
+                self.recorded += 1
+                log_message(f"✅ [{name}] {student['nama']} present ({conf:.0f})")
+                stem = f"{student['id']}-{now.strftime('%Y%m%d%H%M%S')}"
+                snapshot_writer.submit(stem, crop, student['nama'])
+        elif kind == "stats":
+            log_message(f"📈 [{name}] {payload['fps']:.1f} FPS, {payload['latency_ms']:.1f} ms/frame "
+                        f"(p95 {payload['p95_ms']:.1f} ms), {payload['tracks']} tracks")
+        elif kind == "error":
+            log_message(f"❌ [{name}] {payload}")
+
+    def run(self):
+        student_registry.refresh(force=True)
+        # Its own journal, so the daemon can run next to the camera kiosk (main.py)
+        self.journal = AttendanceJournal("daemon").start()
+        signal.signal(signal.SIGINT, self.request_stop)
+        signal.signal(signal.SIGTERM, self.request_stop)
+
+        for name, worker in self.workers.items():
+            worker.start()
+            log_message(f"🎥 [{name}] started on {self.sources[name]}")
+
+        running = set(self.workers)
+        try:
+            while running:
+                try:
+                    kind, name, payload = self.events.get(timeout=0.5)
+                except queue.Empty:
+                    running = {n for n in running if self.workers[n].is_alive()}
+                    continue
+                if kind == "done":
+                    running.discard(name)
+                    log_message(f"⏹️ [{name}] finished")
+                else:
+                    self.handle(kind, name, payload)
+        finally:
+            self.stop.set()
+            for worker in self.workers.values():
+                worker.join(timeout=5)
+                if worker.is_alive():
+                    worker.terminate()
+            self.journal.close()
+            snapshot_writer.close()
+            log_message(f"🛑 Daemon stopped, {self.recorded} attendance records written")
+            flush_logs()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless attendance over several cameras, streams or video files")
+    parser.add_argument("sources", nargs="+", help="Device index, RTSP/HTTP URL or video file path")
+    parser.add_argument("--start", default="00:00", help="Allowed start time (HH:MM)")
+    parser.add_argument("--end", default="23:59", help="Allowed end time (HH:MM)")
+    parser.add_argument("--loop", action="store_true", help="Restart video files when they end")
+    parser.add_argument("--report-interval", type=float, default=DAEMON_REPORT_INTERVAL, help="Seconds between FPS reports")
+    args = parser.parse_args()
+
+    AttendanceDaemon(args.sources, args.start, args.end, args.loop, args.report_interval).run()
+
+
+if __name__ == "__main__":
+    main()
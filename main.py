@@ -1,11 +1,19 @@
-import threading
+import queue, threading
 import tkinter as tk
 from tkinter import ttk, messagebox
 from PIL import Image, ImageTk
 import cv2
 
-from utils.data_manager import load_students, save_students, update_attendance_record
-from utils.face_utils import predict_student, save_face_snapshot
+from utils.data_manager import update_attendance_record
+from utils.face_utils import predict_students, save_face_snapshot
+from utils.snapshots import snapshot_writer
+from utils.face_pipeline import FaceDetector
+from utils.pipeline import LatestQueue, RateMeter, start_stage
+from utils.tracker import FaceTracker
+from utils.metrics import SummaryReporter
+from utils.logger import log_message
+from utils.journal import AttendanceJournal
+from utils.registry import student_registry
 
 
 class AttendanceApp:
@@ -48,9 +56,22 @@ class AttendanceApp:
         self.start_btn = ttk.Button(root, text="Start Attendance", command=self.start_system)
         self.start_btn.pack(pady=10)
 
+        self.lbl_fps = ttk.Label(self.info_frame, text="", font=("Arial", 10))
+        self.lbl_fps.pack(pady=5)
+
         self.cap = None
-        self.students = None
+        self.journal = None
         self.running = False
+        self.camera_error = False
+        self.stages = []
+        self.reporter = None
+        self.startup_events = queue.Queue()
+        self.frame_queue = LatestQueue(2)
+        self.detect_queue = LatestQueue(2)
+        self.render_queue = LatestQueue(2)
+        self.capture_fps = RateMeter()
+        self.process_fps = RateMeter()
+        self.tracker = FaceTracker()
 
     def set_time_range(self):
         """Dialog for selecting start & end time"""
@@ -85,80 +106,158 @@ class AttendanceApp:
     def start_system(self):
         self.start_btn.config(state="disabled")
         self.lbl_status.config(text="Loading model and students data...")
+        self.camera_error = False
         threading.Thread(target=self.load_and_run, daemon=True).start()
+        self.root.after(50, self.poll_startup)
 
     def load_and_run(self):
+        # Worker thread: reports through startup_events, poll_startup applies them on the Tk thread
         try:
-            self.students = load_students()
-            self.lbl_status.config(text="Model loaded. Starting camera...")
+            self.journal = self.journal or AttendanceJournal().start()
+            student_registry.refresh(force=True)
+            self.startup_events.put(("status", "Model loaded. Starting camera..."))
 
             self.cap = cv2.VideoCapture(0)
+            if not self.cap.isOpened():
+                raise RuntimeError("Failed to access camera")
+            self.tracker.reset()
             self.running = True
-            self.update_frame()
+            self.stages = [start_stage("capture", self.capture_loop),
+                           start_stage("detect", self.detect_loop),
+                           start_stage("recognize", self.recognize_loop)]
+            self.reporter = SummaryReporter(log_message).start()
+            self.startup_events.put(("ready", None))
         except Exception as e:
-            messagebox.showerror("Error", str(e))
+            self.startup_events.put(("error", str(e)))
+
+    def poll_startup(self):
+        try:
+            kind, payload = self.startup_events.get_nowait()
+        except queue.Empty:
+            self.root.after(50, self.poll_startup)
+            return
+
+        if kind == "status":
+            self.lbl_status.config(text=payload)
+            self.root.after(50, self.poll_startup)
+        elif kind == "ready":
+            self.render()
+        else:
+            self.stop_pipeline()
+            self.lbl_status.config(text=payload)
+            messagebox.showerror("Error", payload)
             self.start_btn.config(state="normal")
 
-    def update_frame(self):
+    def stop_pipeline(self):
+        self.running = False
+        if self.reporter:
+            self.reporter.stop()
+            self.reporter = None
+        for stage in self.stages:
+            stage.join(timeout=2)
+        self.stages = []
+        if self.cap:
+            self.cap.release()
+            self.cap = None
+
+    # Pipeline: capture -> detect -> recognize run on their own threads and hand over
+    # through small drop-oldest queues; only render() and poll_startup() touch Tk, on the main thread.
+
+    def capture_loop(self):
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.camera_error = True
+                break
+            self.capture_fps.tick()
+            self.frame_queue.put(frame)
+
+    def detect_loop(self):
+        detector = FaceDetector()
+        while self.running:
+            frame = self.frame_queue.get(timeout=0.5)
+            if frame is None:
+                continue
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            faces = detector.detect(gray)
+            self.detect_queue.put((frame, gray, faces))
+
+    def recognize_loop(self):
+        while self.running:
+            item = self.detect_queue.get(timeout=0.5)
+            if item is None:
+                continue
+            frame, gray, faces = item
+            tracks = self.tracker.update(faces)
+
+            # Only new, weakly matched or stale tracks go back to the recognizer
+            pending = [t for t in tracks if self.tracker.needs_recognition(t)]
+            results = predict_students([gray[y:y+h, x:x+w] for (x, y, w, h) in (t.box for t in pending)],
+                                       student_registry.students(), aligned=True)
+            for track, (student, conf) in zip(pending, results):
+                track.set_identity(student, conf)
+                if student:
+                    updated, now = update_attendance_record(student, self.start_time, self.end_time, journal=self.journal)
+                    if updated:
+                        save_face_snapshot(student, frame, track.box, now)
+
+            detected_name, detected_conf = None, None
+            for track in tracks:
+                (x, y, w, h), student, conf = track.box, track.student, track.conf
+                if student:
+                    detected_name = student['nama']
+                    detected_conf = conf
+                    color = (0, 255, 0)
+                    cv2.putText(frame, f"{student['nama']} ({conf:.0f})", (x, y - 10),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+                    cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+                else:
+                    detected_name = "Unknown"
+                    detected_conf = conf
+                    color = (0, 0, 255)
+                    cv2.putText(frame, "Unknown", (x, y - 10),
+                                cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
+                    cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
+
+            # PIL conversion is done here so the Tk thread only builds the PhotoImage
+            img = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            self.process_fps.tick()
+            self.render_queue.put((img, detected_name, detected_conf))
+
+    def render(self):
         if not self.running:
             return
 
-        ret, frame = self.cap.read()
-        if not ret:
+        if self.camera_error:
+            self.stop_pipeline()
             self.lbl_status.config(text="Failed to access camera")
+            self.start_btn.config(state="normal")
             return
 
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
-        faces = face_cascade.detectMultiScale(gray, scaleFactor=1.2, minNeighbors=5)
-
-        detected_name, detected_conf = None, None
-
-        for (x, y, w, h) in faces:
-            student, conf = predict_student(gray[y:y+h, x:x+w], self.students)
-
-            if student:
-                detected_name = student['nama']
-                detected_conf = conf
-                color = (0, 255, 0)
-                cv2.putText(frame, f"{student['nama']} ({conf:.0f})", (x, y - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
-                cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
-
-                updated, now = update_attendance_record(student, self.start_time, self.end_time)
-                if updated:
-                    save_face_snapshot(student, frame, (x, y, w, h), now)
-                    save_students(self.students)
+        item = self.render_queue.get_latest()
+        if item is not None:
+            img, detected_name, detected_conf = item
+            if detected_name:
+                self.lbl_name.config(text=f"Name: {detected_name}")
+                self.lbl_conf.config(text=f"Confidence: {detected_conf:.0f}" if detected_conf else "")
+                self.lbl_status.config(text="Detected")
             else:
-                detected_name = "Unknown"
-                detected_conf = conf
-                color = (0, 0, 255)
-                cv2.putText(frame, "Unknown", (x, y - 10),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.8, color, 2)
-                cv2.rectangle(frame, (x, y), (x + w, y + h), color, 2)
-
-        if detected_name:
-            self.lbl_name.config(text=f"Name: {detected_name}")
-            self.lbl_conf.config(text=f"Confidence: {detected_conf:.0f}" if detected_conf else "")
-            self.lbl_status.config(text="Detected")
-        else:
-            self.lbl_name.config(text="")
-            self.lbl_conf.config(text="")
-            self.lbl_status.config(text="No face detected")
+                self.lbl_name.config(text="")
+                self.lbl_conf.config(text="")
+                self.lbl_status.config(text="No face detected")
 
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        img = Image.fromarray(frame_rgb)
-        imgtk = ImageTk.PhotoImage(image=img)
-        self.lbl_video.imgtk = imgtk
-        self.lbl_video.configure(image=imgtk)
+            imgtk = ImageTk.PhotoImage(image=img)
+            self.lbl_video.imgtk = imgtk
+            self.lbl_video.configure(image=imgtk)
+            self.lbl_fps.config(text=f"Camera {self.capture_fps.rate:.0f} FPS | Processed {self.process_fps.rate:.0f} FPS")
 
-        self.root.after(10, self.update_frame)
+        self.root.after(15, self.render)
 
     def on_close(self):
-        self.running = False
-        if self.cap:
-            self.cap.release()
-        save_students(self.students) if self.students else None
+        self.stop_pipeline()
+        if self.journal:
+            self.journal.close()
+        snapshot_writer.close()
         self.root.destroy()
 
 
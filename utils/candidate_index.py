@@ -0,0 +1,166 @@
+import os, sys
+import numpy as np
+
+try:
+    from config import INDEX_PATH, INDEX_MIN_STUDENTS, INDEX_CANDIDATES, INDEX_DIMS, MODEL_BIN_PATH
+    from lbph_model import LBPHModel, chi_square_distances
+except ImportError:
+    from utils.config import INDEX_PATH, INDEX_MIN_STUDENTS, INDEX_CANDIDATES, INDEX_DIMS, MODEL_BIN_PATH
+    from utils.lbph_model import LBPHModel, chi_square_distances
+
+INDEX_VERSION = 1
+# Rows are read in blocks of this many students while building centroids
+BUILD_BLOCK = 256
+
+
+def projection(bins, dims, seed=0):
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal((bins, dims), dtype=np.float32) / np.float32(np.sqrt(dims)))
+
+
+class CentroidIndex:
+    """Per-student centroid prefilter in front of the exact chi-square search.
+
+    Each student is summarised by the mean of its rows after a square-root (Hellinger)
+    map and a fixed random projection to `dims` dimensions, where plain Euclidean
+    distance tracks chi-square closely. A query is projected the same way, the
+    `candidates` nearest student centroids are picked, and only those students' rows
+    are scored exactly. More candidates means higher recall against exhaustive search
+    and a slower query; measure_recall() reports the trade-off for a model.
+    """
+
+    def __init__(self, centroids, classes, model_id, dims=INDEX_DIMS, seed=0, candidates=INDEX_CANDIDATES):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.classes = np.asarray(classes, dtype=np.int32)
+        self.model_id = model_id
+        self.dims = dims
+        self.seed = seed
+        self.candidates = candidates
+        self._projection = None
+        self._norms = (self.centroids ** 2).sum(axis=1)
+
+    def _project(self, hists):
+        if self._projection is None:
+            self._projection = projection(hists.shape[1], self.dims, self.seed)
+        return np.sqrt(np.maximum(hists, 0, dtype=np.float32)) @ self._projection
+
+    @classmethod
+    def build(cls, model, dims=INDEX_DIMS, seed=0, candidates=INDEX_CANDIDATES):
+        index = cls(np.zeros((0, dims), np.float32), model.classes, model.model_id, dims, seed, candidates)
+        centroids = np.empty((len(model.classes), dims), dtype=np.float32)
+        starts = np.append(model._starts, len(model.labels))
+
+        for c0 in range(0, len(model.classes), BUILD_BLOCK):
+            c1 = min(c0 + BUILD_BLOCK, len(model.classes))
+            rows = model._order[starts[c0]:starts[c1]]
+            embedded = index._project(np.asarray(model.histograms[np.sort(rows)], dtype=np.float32))
+            # Back to label order, then mean per student
+            embedded = embedded[np.argsort(np.argsort(rows))]
+            sums = np.add.reduceat(embedded, starts[c0:c1] - starts[c0], axis=0)
+            centroids[c0:c1] = sums / np.diff(starts[c0:c1 + 1])[:, None]
+
+        index.centroids = centroids
+        index._norms = (centroids ** 2).sum(axis=1)
+        return index
+
+    def candidate_classes(self, hists, n=None):
+        """Positions in model.classes of the `n` nearest centroids for each query row."""
+        n = min(n or self.candidates, len(self.classes))
+        q = self._project(hists)
+        dist = self._norms[None, :] - 2.0 * (q @ self.centroids.T)
+        if n >= dist.shape[1]:
+            return np.tile(np.arange(dist.shape[1]), (len(q), 1))
+        return np.argpartition(dist, n - 1, axis=1)[:, :n]
+
+    def search(self, model, hists, k=1, n=None):
+        """Exact top-k over the rows of the candidate students; same output as LBPHModel.top_k_from_distances."""
+        hists = np.atleast_2d(np.asarray(hists, dtype=np.float32))
+        starts = np.append(model._starts, len(model.labels))
+        results = []
+        for query, picked in zip(hists, self.candidate_classes(hists, n)):
+            rows = np.concatenate([model._order[starts[c]:starts[c + 1]] for c in picked])
+            order = np.argsort(rows)
+            rows, owners = rows[order], np.repeat(picked, np.diff(starts)[picked])[order]
+            distances = chi_square_distances(query, model.histograms[rows])
+
+            best = {}
+            for owner, dist in zip(owners, distances):
+                if dist < best.get(owner, np.inf):
+                    best[owner] = dist
+            ranked = sorted(best.items(), key=lambda item: item[1])[:k]
+            results.append([(int(model.classes[c]), float(d)) for c, d in ranked])
+        return results
+
+    def save(self, path=INDEX_PATH):
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, centroids=self.centroids, classes=self.classes,
+                 meta=np.array([INDEX_VERSION, self.dims, self.seed], dtype=np.int64), model_id=np.array(self.model_id))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path=INDEX_PATH, candidates=INDEX_CANDIDATES):
+        with np.load(path) as data:
+            version, dims, seed = (int(v) for v in data["meta"])
+            if version != INDEX_VERSION:
+                raise ValueError(f"Unsupported index version {version}")
+            return cls(data["centroids"], data["classes"], str(data["model_id"]), dims, seed, candidates)
+
+
+def wants_index(model, min_students=INDEX_MIN_STUDENTS):
+    return min_students is not None and len(model.classes) >= min_students
+
+
+def build_index(model, path=INDEX_PATH):
+    """Rebuild and save the index for a freshly trained model; removes it for small models."""
+    if not wants_index(model):
+        if os.path.exists(path):
+            os.remove(path)
+        return None
+    index = CentroidIndex.build(model)
+    index.save(path)
+    return index
+
+
+def load_index(model, path=INDEX_PATH):
+    """Index for `model` if one exists and was built from exactly these rows, else None."""
+    if not wants_index(model) or not os.path.exists(path):
+        return None
+    try:
+        index = CentroidIndex.load(path)
+    except (OSError, ValueError, KeyError):
+        return None
+    return index if index.model_id == model.model_id else None
+
+
+def measure_recall(model, index, queries, k=1, n=None):
+    """Share of queries whose exhaustive top-k labels the index also returns; queries are histograms."""
+    queries = np.atleast_2d(queries)
+    exact = model.top_k_from_distances(chi_square_distances(queries, model.histograms), k)
+    approx = index.search(model, queries, k, n)
+    hits = sum(len({l for l, _ in e} & {l for l, _ in a}) for e, a in zip(exact, approx))
+    top1 = sum(bool(e) and bool(a) and e[0][0] == a[0][0] for e, a in zip(exact, approx))
+    total = sum(len(e) for e in exact)
+    return {"queries": len(queries), "k": k, "candidates": n or index.candidates,
+            "recall": hits / total if total else 1.0, "top1_agreement": top1 / len(queries)}
+
+
+if __name__ == "__main__":
+    # python -m utils.candidate_index [build | recall [samples] [candidates]]
+    command = sys.argv[1] if len(sys.argv) > 1 else "build"
+    model = LBPHModel.load(MODEL_BIN_PATH)
+    if command == "build":
+        index = CentroidIndex.build(model)
+        index.save()
+        print(f"Index built for {len(index.classes)} students -> {INDEX_PATH}")
+    elif command == "recall":
+        samples = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+        candidates = int(sys.argv[3]) if len(sys.argv) > 3 else INDEX_CANDIDATES
+        index = load_index(model) or CentroidIndex.build(model)
+        rows = np.random.default_rng(0).choice(len(model.labels), min(samples, len(model.labels)), replace=False)
+        # Stored training rows as queries, jittered so a row does not trivially find itself
+        queries = np.asarray(model.histograms[np.sort(rows)], dtype=np.float32)
+        queries = np.abs(queries + np.random.default_rng(1).normal(0, queries.std(), queries.shape).astype(np.float32))
+        for k in (1, 5):
+            print(measure_recall(model, index, queries, k, candidates))
+    else:
+        raise SystemExit(f"Unknown command {command}, use build or recall")
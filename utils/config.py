@@ -1,4 +1,4 @@
-import os
+import os, json
 
 DATA_DIR = "Data"
 CACHE_DIR = os.path.join(DATA_DIR, ".cache")
@@ -7,9 +7,93 @@ IMAGES_DIR = os.path.join(DATA_DIR, "Images")
 
 CSV_PATH = os.path.join(DATA_DIR, "students.csv")
 MODEL_PATH = os.path.join(DATA_DIR, "face_model.yml")
+MODEL_BIN_PATH = os.path.join(DATA_DIR, "face_model.bin")
+MANIFEST_PATH = os.path.join(DATA_DIR, "face_model.manifest.json")
 ATTENDANCE_PATH = os.path.join(DATA_DIR, "attendance_history.csv")
+DB_PATH = os.path.join(DATA_DIR, "attendance.db")
+JOURNAL_PATH = os.path.join(DATA_DIR, "attendance.journal")
 LOG_PATH = os.path.join(CACHE_DIR, "system.txt")
+FACE_CACHE_DIR = os.path.join(CACHE_DIR, "faces")
 CONFIG_PATH = os.path.join(DATA_DIR, "config.json")
 
 for d in [IMAGES_DIR, DATA_DIR, LOGS_DIR, CACHE_DIR]:
-    os.makedirs(d, exist_ok=True)
\ No newline at end of file
+    os.makedirs(d, exist_ok=True)
+
+
+def load_settings(path=CONFIG_PATH):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+SETTINGS = load_settings()
+
+STORAGE_BACKEND = SETTINGS.get("storage_backend", "sqlite")
+
+RECOGNITION_THRESHOLD = SETTINGS.get("recognition_threshold", 70)
+RECOGNITION_POOL = SETTINGS.get("recognition_pool", "thread")
+RECOGNITION_WORKERS = SETTINGS.get("recognition_workers", os.cpu_count() or 2)
+RECOGNITION_QUEUE_SIZE = SETTINGS.get("recognition_queue_size", 32)
+
+JOURNAL_BATCH_SIZE = SETTINGS.get("journal_batch_size", 32)
+JOURNAL_FLUSH_INTERVAL = SETTINGS.get("journal_flush_interval", 0.5)
+
+TRAINING_WORKERS = SETTINGS.get("training_workers", os.cpu_count() or 1)
+FACE_CACHE_MAX_BYTES = SETTINGS.get("face_cache_max_mb", 512) * 1024 * 1024
+
+TRACK_IOU_THRESHOLD = SETTINGS.get("track_iou_threshold", 0.3)
+TRACK_MAX_MISSED = SETTINGS.get("track_max_missed", 10)
+TRACK_RECHECK_FRAMES = SETTINGS.get("track_recheck_frames", 30)
+# Tracks whose last distance is at or above this are re-recognized on every frame. It defaults
+# to the recognition threshold, so only unknown faces are retried; a lower value also
+# re-checks weak matches, at the cost of running the recognizer for them on each frame.
+TRACK_LOW_CONFIDENCE = SETTINGS.get("track_low_confidence", RECOGNITION_THRESHOLD)
+
+DETECT_SCALE = SETTINGS.get("detect_scale", 0.5)
+DETECT_FULL_SCAN_FRAMES = SETTINGS.get("detect_full_scan_frames", 10)
+DETECT_ROI_MARGIN = SETTINGS.get("detect_roi_margin", 0.5)
+
+SNAPSHOT_FORMAT = SETTINGS.get("snapshot_format", "jpg")
+SNAPSHOT_QUALITY = SETTINGS.get("snapshot_quality", 85)
+SNAPSHOT_MARGIN = SETTINGS.get("snapshot_margin", 60)
+SNAPSHOT_QUEUE_SIZE = SETTINGS.get("snapshot_queue_size", 16)
+SNAPSHOT_MAX_BYTES = SETTINGS.get("snapshot_max_mb", 500) * 1024 * 1024
+SNAPSHOT_MAX_AGE_DAYS = SETTINGS.get("snapshot_max_age_days", 90)
+SNAPSHOT_PRUNE_INTERVAL = SETTINGS.get("snapshot_prune_interval", 600)
+
+LOG_LEVEL = SETTINGS.get("log_level", "INFO")
+LOG_FORMAT = SETTINGS.get("log_format", "text")
+LOG_MAX_BYTES = SETTINGS.get("log_max_mb", 5) * 1024 * 1024
+LOG_BACKUP_COUNT = SETTINGS.get("log_backup_count", 3)
+LOG_FLUSH_INTERVAL = SETTINGS.get("log_flush_interval", 0.5)
+LOG_UI_INTERVAL = SETTINGS.get("log_ui_interval", 100)
+
+METRICS_ENABLED = SETTINGS.get("metrics_enabled", True)
+METRICS_SUMMARY_INTERVAL = SETTINGS.get("metrics_summary_interval", 60)
+
+INDEX_PATH = os.path.join(DATA_DIR, "face_model.index.npz")
+INDEX_MIN_STUDENTS = SETTINGS.get("index_min_students", 200)
+INDEX_CANDIDATES = SETTINGS.get("index_candidates", 32)
+INDEX_DIMS = SETTINGS.get("index_dims", 256)
+
+WS_ATTENDANCE_COOLDOWN = SETTINGS.get("ws_attendance_cooldown", 30)
+
+DAEMON_REPORT_INTERVAL = SETTINGS.get("daemon_report_interval", 10)
+
+# "mmap": every process maps the model file, "shm": one process publishes the model into
+# shared memory and the others attach, "private": each process reads its own copy
+MODEL_SHARING = SETTINGS.get("model_sharing", "mmap" if os.name != "nt" else "private")
+SHARED_MODEL_PATH = os.path.join(CACHE_DIR, "shared_model.json")
+
+MAX_UPLOAD_BYTES = SETTINGS.get("max_upload_mb", 10) * 1024 * 1024
+MAX_REQUEST_BYTES = SETTINGS.get("max_request_mb", 64) * 1024 * 1024
+# Reduced decoding keeps at least this many pixels on the short side
+DECODE_MIN_SIDE = SETTINGS.get("decode_min_side", 480)
+
+ATTENDANCE_PAGE_SIZE = SETTINGS.get("attendance_page_size", 100)
+ATTENDANCE_MAX_PAGE_SIZE = SETTINGS.get("attendance_max_page_size", 1000)
+# Default "From" date of the Tk history and report tabs, and rows per "Load more" page
+HISTORY_TAB_DAYS = SETTINGS.get("history_tab_days", 30)
+HISTORY_TAB_PAGE_SIZE = SETTINGS.get("history_tab_page_size", 500)
@@ -2,11 +2,19 @@ import pandas as pd, os
 from datetime import datetime, timedelta
 
 try:
-    from config import CSV_PATH, ATTENDANCE_PATH
+    from config import CSV_PATH, ATTENDANCE_PATH, JOURNAL_PATH, STORAGE_BACKEND, ATTENDANCE_PAGE_SIZE
     from logger import log_message
+    from storage import get_storage, encode_cursor, decode_cursor
+    from metrics import metrics
 except ImportError:
-    from utils.config import CSV_PATH, ATTENDANCE_PATH
+    from utils.config import CSV_PATH, ATTENDANCE_PATH, JOURNAL_PATH, STORAGE_BACKEND, ATTENDANCE_PAGE_SIZE
     from utils.logger import log_message
+    from utils.storage import get_storage, encode_cursor, decode_cursor
+    from utils.metrics import metrics
+
+
+def use_sqlite():
+    return STORAGE_BACKEND == "sqlite"
 
 
 def get_next_id(df):
@@ -16,7 +24,8 @@ def get_next_id(df):
 # ========================== API ==========================
 
 
-def update_attendance_record(student: dict, start_time_str: str, end_time_str: str, minutes=10) -> bool:
+@metrics.timed("attendance_update")
+def update_attendance_record(student: dict, start_time_str: str, end_time_str: str, minutes=10, journal=None) -> bool:
     START_TIME = datetime.strptime(start_time_str, "%H:%M").time()
     END_TIME = datetime.strptime(end_time_str, "%H:%M").time()
 
@@ -27,16 +36,25 @@ def update_attendance_record(student: dict, start_time_str: str, end_time_str: s
     if not (START_TIME <= now.time() <= END_TIME):
         return False, now
 
-    if last_time and (now - last_time) < timedelta(minutes):
+    if last_time and (now - last_time) < timedelta(minutes=minutes):
         return False, now
 
-    student['total_kehadiran'] = str(int(student.get('total_kehadiran', 0)) + 1)
+    student['total_kehadiran'] = int(student.get('total_kehadiran', 0)) + 1
     student['waktu_kehadiran'] = now.strftime("%Y-%m-%d %H:%M:%S")
+    # Other processes write attendance too, storage repeats the window check against its own times
+    since = (now - timedelta(minutes=minutes)).strftime("%Y-%m-%d %H:%M:%S")
 
-    save_attendance(student)
+    if journal:
+        journal.append(student, since=since)
+    elif not save_attendance(student, since=since):
+        # Another process recorded the student within the window, `student` now holds its values
+        return False, now
+    metrics.count("attendance_recorded")
     return True, now
 
 def load_data():
+    if use_sqlite():
+        return get_storage().students_frame()
     if os.path.exists(CSV_PATH):
         df = pd.read_csv(CSV_PATH)
     else:
@@ -44,32 +62,219 @@ def load_data():
     return df
 
 def load_attendance():
+    if use_sqlite():
+        return get_storage().attendance_frame()
     if os.path.exists(ATTENDANCE_PATH):
         return pd.read_csv(ATTENDANCE_PATH)
     return pd.DataFrame(columns=["id","name","date","status"])
 
+def query_attendance(student_id=None, kelas=None, start=None, end=None, cursor=None, limit=ATTENDANCE_PAGE_SIZE):
+    """One page of attendance history as (rows, next_cursor), see SQLiteStorage.query_attendance."""
+    if use_sqlite():
+        return get_storage().query_attendance(student_id, kelas, start, end, cursor, limit)
+
+    # The CSV has no index, so this still reads the whole file; seq is the row position
+    if not os.path.exists(ATTENDANCE_PATH):
+        return [], None
+    df = pd.read_csv(ATTENDANCE_PATH, dtype={"timestamp": str})
+    df.insert(0, "seq", range(1, len(df) + 1))
+    classes = load_data().set_index("id")["kelas"]
+    df["kelas"] = df["id"].map(classes)
+    mask = pd.Series(True, index=df.index)
+    if student_id is not None:
+        mask &= df["id"] == int(student_id)
+    if kelas is not None:
+        mask &= df["kelas"] == kelas
+    if start:
+        mask &= df["timestamp"] >= start
+    if end:
+        mask &= df["timestamp"] < end
+    if cursor:
+        after_ts, after_seq = decode_cursor(cursor)
+        mask &= (df["timestamp"] > after_ts) | ((df["timestamp"] == after_ts) & (df["seq"] > after_seq))
+    page = df[mask].sort_values(["timestamp", "seq"]).head(limit + 1)
+    rows = page[["seq", "id", "name", "kelas", "timestamp", "status"]].astype(object).where(page.notna(), None).to_dict("records")
+    next_cursor = encode_cursor(rows[limit - 1]["timestamp"], rows[limit - 1]["seq"]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def _csv_daily(start=None, end=None):
+    # The CSV backend keeps no rollups, so they are recomputed from the history file
+    if not os.path.exists(ATTENDANCE_PATH):
+        return pd.DataFrame(columns=["day", "id", "kelas", "records", "first_seen", "last_seen"])
+    df = pd.read_csv(ATTENDANCE_PATH, dtype={"timestamp": str})
+    df["day"] = df["timestamp"].str[:10]
+    df["kelas"] = df["id"].map(load_data().set_index("id")["kelas"]).fillna("")
+    if start:
+        df = df[df["day"] >= start[:10]]
+    if end:
+        df = df[df["day"] < end[:10]]
+    return (df.groupby(["day", "id"]).agg(kelas=("kelas", "first"), records=("timestamp", "size"),
+                                          first_seen=("timestamp", "min"), last_seen=("timestamp", "max"))
+              .reset_index())
+
+def attendance_rollup(by="student", student_id=None, kelas=None, start=None, end=None):
+    """Daily attendance per student or per class, see SQLiteStorage.daily_rollup."""
+    if use_sqlite():
+        return get_storage().daily_rollup(by, student_id, kelas, start, end)
+    daily = _csv_daily(start, end)
+    if by == "student" and student_id is not None:
+        daily = daily[daily["id"] == int(student_id)]
+    if kelas is not None:
+        daily = daily[daily["kelas"] == kelas]
+    if by == "class":
+        daily = (daily.groupby(["day", "kelas"]).agg(students=("id", "size"), records=("records", "sum"),
+                                                     first_seen=("first_seen", "min"), last_seen=("last_seen", "max"))
+                      .reset_index())
+        return daily[["day", "kelas", "students", "records", "first_seen", "last_seen"]].to_dict("records")
+    return daily[["day", "id", "kelas", "records", "first_seen", "last_seen"]].to_dict("records")
+
+def attendance_rates(by="student", kelas=None, start=None, end=None):
+    """(session_days, rows) of attendance rates over [start, end), see SQLiteStorage.attendance_rates."""
+    if use_sqlite():
+        return get_storage().attendance_rates(by, kelas, start, end)
+    daily, students = _csv_daily(start, end), load_data()
+    students["kelas"] = students["kelas"].fillna("")
+    if kelas is not None:
+        students = students[students["kelas"] == kelas]
+    sessions = daily["day"].nunique()
+    key = "kelas" if by == "class" else "id"
+    present = daily.groupby(key).agg(days_present=("day", "size"), first_seen=("first_seen", "min"),
+                                     last_seen=("last_seen", "max"))
+    if by == "class":
+        rows = students.groupby("kelas").size().rename("students").reset_index().join(present, on="kelas")
+    else:
+        rows = students[["id", "nama", "kelas"]].join(present, on="id")
+    rows["days_present"] = rows["days_present"].fillna(0).astype(int)
+    possible = sessions * (rows["students"] if by == "class" else 1)
+    rows["rate"] = (rows["days_present"] / possible).round(4) if sessions else None
+    return sessions, rows.astype(object).where(rows.notna(), None).to_dict("records")
+
+def rebuild_rollups():
+    if use_sqlite():
+        return get_storage().rebuild_rollups()
+    log_message("ℹ️ The CSV backend computes reports from the history file, there is nothing to rebuild")
+    return 0
+
 def save_data(df):
-    df.to_csv(CSV_PATH, index=False)
+    if use_sqlite():
+        get_storage().replace_students(df)
+    else:
+        df.to_csv(CSV_PATH, index=False)
     log_message("✅ Data saved")
 
+@metrics.timed("load_students")
 def load_students():
+    if use_sqlite():
+        return get_storage().student_index()
     df = pd.read_csv(CSV_PATH, encoding='utf-8')
-    return {str(row['id']): row.to_dict() for _, row in df.iterrows()}
+    return dict(zip(df["id"].astype(str), df.to_dict("records")))
+
+def students_stamp():
+    """Changes whenever the stored students change, used to invalidate in-memory copies."""
+    if use_sqlite():
+        return get_storage().students_version()
+    try:
+        st = os.stat(CSV_PATH)
+    except FileNotFoundError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+def _csv_record(events):
+    """Append events to the CSV history and bump the students' counters; returns (recorded events, counters).
 
-def save_attendance(student):
-    new_row = pd.DataFrame([{
-        "id": student['id'],
-        "name": student['nama'],
-        "timestamp": student['waktu_kehadiran'],
-        "status": "Present"
-    }])
+    An event whose `since` is at or before the student's stored attendance time is
+    dropped as a duplicate. counters maps the id of every student touched to its stored
+    (total_kehadiran, waktu_kehadiran).
+    """
+    df = load_data()
+    df["total_kehadiran"] = pd.to_numeric(df["total_kehadiran"], errors="coerce").fillna(0).astype(int)
+    rows = dict(zip(df["id"].astype(str), df.index))
+    recorded, counters = [], {}
+    for e in events:
+        i = rows.get(str(e["id"]))
+        if i is None:
+            # Unknown student, only the history row is written (as with SQLite)
+            recorded.append(e)
+            continue
+        last = df.at[i, "waktu_kehadiran"]
+        last = last if isinstance(last, str) else ""
+        if not (e.get("since") and last >= e["since"]):
+            df.at[i, "total_kehadiran"] += 1
+            df.at[i, "waktu_kehadiran"] = max(last, e["timestamp"])
+            recorded.append(e)
+        counters[str(e["id"])] = (int(df.at[i, "total_kehadiran"]), df.at[i, "waktu_kehadiran"])
 
-    new_row.to_csv(ATTENDANCE_PATH, mode='a', index=False, header=False)
-    log_message(f"✅ Attendance saved for {student['nama']}")
+    if recorded:
+        pd.DataFrame([{
+            "id": e["id"], "name": e["nama"], "timestamp": e["timestamp"], "status": e["status"]
+        } for e in recorded]).to_csv(ATTENDANCE_PATH, mode='a', index=False, header=False)
+        df.to_csv(CSV_PATH, index=False, encoding='utf-8')
+    return recorded, counters
+
+def attendance_stamp():
+    """Moves whenever attendance is written; None for CSV, where counters live in the students file."""
+    return get_storage().attendance_seq() if use_sqlite() else None
+
+def load_counters(since):
+    """{id: {"total_kehadiran", "waktu_kehadiran"}} of the students recorded after attendance_stamp() was `since`."""
+    return get_storage().counters_since(since) if use_sqlite() else {}
+
+@metrics.timed("persist")
+def save_attendance(student, since=None):
+    """Record one attendance of `student` at its waktu_kehadiran; returns False when `since` marks it a duplicate."""
+    if use_sqlite():
+        # Also persists the student's counter, so callers need no full save_students
+        recorded = get_storage().record_attendance(student, since=since)
+    else:
+        recorded, counters = _csv_record([{"id": student['id'], "nama": student['nama'], "status": "Present",
+                                           "timestamp": student['waktu_kehadiran'], "since": since}])
+        recorded = bool(recorded)
+        if str(student['id']) in counters:
+            student['total_kehadiran'], student['waktu_kehadiran'] = counters[str(student['id'])]
+
+    if recorded:
+        log_message(f"✅ Attendance saved for {student['nama']}")
+    return recorded
+
+def journal_path(name=None):
+    """Journal file of one writer process; the unnamed journal is the camera kiosk's."""
+    return JOURNAL_PATH if name is None else f"{JOURNAL_PATH}-{name}"
+
+def journal_key(name=None):
+    return "journal_seq" if name is None else f"journal_seq:{name}"
+
+def journal_checkpoint(name=None):
+    """Sequence number of the last event of journal `name` applied to storage."""
+    if use_sqlite():
+        return get_storage().journal_seq(journal_key(name))
+    try:
+        with open(journal_path(name) + ".checkpoint", encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (OSError, ValueError):
+        return 0
+
+@metrics.timed("persist_batch")
+def apply_attendance_events(events, journal_seq, name=None):
+    """Apply journal events (one check-in each) and advance the checkpoint; returns how many were not duplicates."""
+    if use_sqlite():
+        return get_storage().apply_attendance_events(events, journal_seq, journal_key(name))
+
+    # CSV cannot commit both files and the checkpoint atomically, a crash in between
+    # can replay this batch once more on the next start
+    recorded, _ = _csv_record(events)
+
+    checkpoint_path = journal_path(name) + ".checkpoint"
+    with open(checkpoint_path + ".tmp", "w", encoding="utf-8") as f:
+        f.write(str(journal_seq))
+    os.replace(checkpoint_path + ".tmp", checkpoint_path)
+    return len(recorded)
 
 def save_students(students):
     if not students:
         return
+    if use_sqlite():
+        get_storage().upsert_students(students.values())
+        return
     df = pd.DataFrame(students.values())
     df.to_csv(CSV_PATH, index=False, encoding='utf-8')
 
@@ -16,5 +16,5 @@ def handle_exception(exc_type, exc_value, exc_traceback):
         sys.__excepthook__(exc_type, exc_value, exc_traceback)
         return
     error_msg = "".join(traceback.format_exception(exc_type, exc_value, exc_traceback))
-    log_message(f"❌ ERROR: {error_msg}")
+    log_message(f"❌ ERROR: {error_msg}", level="ERROR")
     messagebox.showerror("Unexpected Error", str(exc_value))
\ No newline at end of file
@@ -0,0 +1,91 @@
+import hashlib, json, os
+import numpy as np
+
+try:
+    from config import FACE_CACHE_DIR, FACE_CACHE_MAX_BYTES
+except ImportError:
+    from utils.config import FACE_CACHE_DIR, FACE_CACHE_MAX_BYTES
+
+CACHE_VERSION = 1
+
+
+class FaceCache:
+    """Preprocessed face crops and LBP descriptors keyed by image content + preprocessing settings.
+
+    Entries are plain .npz files under `root`; a hit refreshes the file's mtime and
+    prune() drops the least recently used files once the directory is over budget.
+    Any change to the settings fingerprint yields new keys, so stale entries are never
+    read and simply age out.
+    """
+
+    def __init__(self, root=FACE_CACHE_DIR, max_bytes=FACE_CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def fingerprint(settings: dict) -> str:
+        return hashlib.sha1(json.dumps(dict(settings, version=CACHE_VERSION), sort_keys=True).encode()).hexdigest()
+
+    def key(self, content_hash, fingerprint):
+        return hashlib.sha1(f"{content_hash}:{fingerprint}".encode()).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key + ".npz")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with np.load(path) as data:
+                face = data["face"]
+                descriptor = data["descriptor"] if "descriptor" in data.files else None
+        except (OSError, ValueError, KeyError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return face, descriptor
+
+    def put(self, key, face, descriptor=None):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        arrays = {"face": face} if descriptor is None else {"face": face, "descriptor": descriptor}
+        # Unique temp name, several pool workers may store the same key at once
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                np.savez(f, **arrays)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def prune(self, target_ratio=0.9):
+        """Evict least recently used entries until the cache fits in max_bytes; returns bytes freed."""
+        entries, total = [], 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                path = os.path.join(dirpath, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+                total += st.st_size
+
+        if total <= self.max_bytes:
+            return 0
+
+        freed, limit = 0, self.max_bytes * target_ratio
+        for _, size, path in sorted(entries):
+            if total - freed <= limit:
+                break
+            try:
+                os.remove(path)
+                freed += size
+            except OSError:
+                pass
+        return freed
+
+
+face_cache = FaceCache()
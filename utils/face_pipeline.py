@@ -0,0 +1,185 @@
+import os, threading, multiprocessing as mp
+import cv2, numpy as np
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from config import TRAINING_WORKERS, DETECT_SCALE, DETECT_FULL_SCAN_FRAMES, DETECT_ROI_MARGIN, TRACK_IOU_THRESHOLD
+    from tracker import iou
+    from train_manifest import make_record
+    from lbph_model import lbph_histogram
+    from face_cache import face_cache
+except ImportError:
+    from utils.config import TRAINING_WORKERS, DETECT_SCALE, DETECT_FULL_SCAN_FRAMES, DETECT_ROI_MARGIN, TRACK_IOU_THRESHOLD
+    from utils.tracker import iou
+    from utils.train_manifest import make_record
+    from utils.lbph_model import lbph_histogram
+    from utils.face_cache import face_cache
+
+CASCADE_PATH = cv2.data.haarcascades + "haarcascade_frontalface_default.xml"
+SCALE_FACTOR = 1.2
+MIN_NEIGHBORS = 5
+FACE_SIZE = (200, 200)
+
+# Below this many images the process pool costs more to start than it saves
+MIN_PARALLEL_JOBS = 8
+
+_cascade = None
+_local = threading.local()
+
+
+def thread_cascade():
+    # One classifier per thread, detectMultiScale is not safe to share between threads
+    if not hasattr(_local, "cascade"):
+        _local.cascade = cv2.CascadeClassifier(CASCADE_PATH)
+    return _local.cascade
+
+
+def crop_face(img, cascade, size=FACE_SIZE):
+    faces = cascade.detectMultiScale(img, scaleFactor=SCALE_FACTOR, minNeighbors=MIN_NEIGHBORS)
+    if len(faces) == 0:
+        return None
+    x, y, w, h = faces[0]
+    return cv2.resize(img[y:y+h, x:x+w], size)
+
+
+def align_face(face, size=FACE_SIZE):
+    """Resize a crop that already came from the detector, without detecting again."""
+    return cv2.resize(face, size)
+
+
+def detect_faces(gray, cascade, scale=DETECT_SCALE, offset=(0, 0)):
+    """detectMultiScale on a downscaled copy, boxes mapped back to full resolution."""
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else gray
+    faces = cascade.detectMultiScale(small, scaleFactor=SCALE_FACTOR, minNeighbors=MIN_NEIGHBORS)
+    if len(faces) == 0:
+        return []
+    ox, oy = offset
+    inv = 1.0 / scale if scale < 1 else 1.0
+    return [(int(x * inv) + ox, int(y * inv) + oy, int(w * inv), int(h * inv)) for x, y, w, h in faces]
+
+
+class FaceDetector:
+    """Haar detection tuned for video: downscaled full scans every `full_scan_frames` frames,
+    and in between only the regions around the previous detections are searched.
+
+    Falls back to a full scan as soon as a tracked region loses its face, so new
+    arrivals are picked up within one scan interval at worst.
+    """
+
+    def __init__(self, cascade=None, scale=DETECT_SCALE, full_scan_frames=DETECT_FULL_SCAN_FRAMES, roi_margin=DETECT_ROI_MARGIN):
+        self.cascade = cascade or cv2.CascadeClassifier(CASCADE_PATH)
+        self.scale = scale
+        self.full_scan_frames = full_scan_frames
+        self.roi_margin = roi_margin
+        self.boxes = []
+        self._frames = 0
+
+    def _roi(self, box, shape):
+        x, y, w, h = box
+        mx, my = int(w * self.roi_margin), int(h * self.roi_margin)
+        x1, y1 = max(0, x - mx), max(0, y - my)
+        x2, y2 = min(shape[1], x + w + mx), min(shape[0], y + h + my)
+        return x1, y1, x2, y2
+
+    def detect(self, gray):
+        full = not self.boxes or self._frames % self.full_scan_frames == 0
+        self._frames += 1
+
+        if full:
+            self.boxes = detect_faces(gray, self.cascade, self.scale)
+            return self.boxes
+
+        found = []
+        for box in self.boxes:
+            x1, y1, x2, y2 = self._roi(box, gray.shape)
+            hits = detect_faces(gray[y1:y2, x1:x2], self.cascade, self.scale, offset=(x1, y1))
+            if not hits:
+                # Lost one, rescan the whole frame on the next call
+                self._frames = 0
+                continue
+            best = max(hits, key=lambda b: b[2] * b[3])
+            if any(iou(best, kept) >= TRACK_IOU_THRESHOLD for kept in found):
+                # Overlapping regions found the same face, which leaves one track without
+                # its own; report the face once and rescan on the next call
+                self._frames = 0
+                continue
+            found.append(best)
+
+        self.boxes = found
+        return found
+
+
+def _init_worker():
+    global _cascade
+    # One cascade per worker, and no nested OpenCV threads competing with the pool
+    cv2.setNumThreads(1)
+    _cascade = cv2.CascadeClassifier(CASCADE_PATH)
+
+
+def preprocessing_settings(equalize, lbph_params=None):
+    """Everything that shapes a cached crop or descriptor; changing any of it changes the cache key."""
+    return {
+        "cascade": os.path.basename(CASCADE_PATH),
+        "cascade_size": os.path.getsize(CASCADE_PATH),
+        "scale_factor": SCALE_FACTOR,
+        "min_neighbors": MIN_NEIGHBORS,
+        "face_size": list(FACE_SIZE),
+        "equalize": equalize,
+        "lbph": lbph_params,
+    }
+
+
+def extract_face(job):
+    """Read, decode, detect and crop one image.
+
+    Returns (path, label, record, face, descriptor, error); the LBP descriptor is only
+    computed when LBPH parameters are given.
+    """
+    path, label, equalize, lbph_params, fingerprint = job
+
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+        record = make_record(path, label, data)
+    except OSError:
+        return path, label, None, None, None, "missing"
+
+    key = face_cache.key(record["hash"], fingerprint) if fingerprint else None
+    cached = face_cache.get(key) if key else None
+    if cached is not None and (lbph_params is None or cached[1] is not None):
+        return (path, label, record) + cached + (None,)
+
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    if img is None:
+        return path, label, record, None, None, "unreadable"
+
+    # Pool workers have their own cascade, in-process calls may come from several threads
+    face = crop_face(img, _cascade or thread_cascade())
+    if face is None:
+        return path, label, record, None, None, "no_face"
+
+    face = cv2.equalizeHist(face) if equalize else face
+    descriptor = lbph_histogram(face, **lbph_params) if lbph_params else None
+    if key:
+        face_cache.put(key, face, descriptor)
+    return path, label, record, face, descriptor, None
+
+
+def extract_faces(items, equalize=True, lbph_params=None, workers=TRAINING_WORKERS, use_cache=True):
+    """Yield extract_face results for (path, label) items, in input order.
+
+    Large batches are spread over a process pool; results are still yielded in
+    submission order so labels and model rows stay deterministic.
+    """
+    fingerprint = face_cache.fingerprint(preprocessing_settings(equalize, lbph_params)) if use_cache else None
+    jobs = [(path, label, equalize, lbph_params, fingerprint) for path, label in items]
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs)))
+
+    if workers == 1 or len(jobs) < MIN_PARALLEL_JOBS:
+        for job in jobs:
+            yield extract_face(job)
+        return
+
+    # Spawned, not forked: the Tk manager and the camera loop call this with other threads running
+    with ProcessPoolExecutor(max_workers=workers, mp_context=mp.get_context("spawn"), initializer=_init_worker) as pool:
+        yield from pool.map(extract_face, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
@@ -1,36 +1,50 @@
 import cv2, os, numpy as np
 
 try:
-    from config import MODEL_PATH, IMAGES_DIR, LOGS_DIR
+    from config import MODEL_BIN_PATH, MANIFEST_PATH, IMAGES_DIR, SNAPSHOT_MARGIN, RECOGNITION_THRESHOLD
     from logger import log_message
+    from lbph_model import LBPHModel
+    from model_store import face_model
+    from train_manifest import TrainingManifest, scan_images
+    from face_pipeline import align_face, crop_face, extract_faces, thread_cascade
+    from face_cache import face_cache
+    from snapshots import snapshot_writer
+    from metrics import metrics
+    from candidate_index import build_index
 except ImportError:
-    from utils.config import MODEL_PATH, IMAGES_DIR, LOGS_DIR
+    from utils.config import MODEL_BIN_PATH, MANIFEST_PATH, IMAGES_DIR, SNAPSHOT_MARGIN, RECOGNITION_THRESHOLD
     from utils.logger import log_message
+    from utils.lbph_model import LBPHModel
+    from utils.model_store import face_model
+    from utils.train_manifest import TrainingManifest, scan_images
+    from utils.face_pipeline import align_face, crop_face, extract_faces, thread_cascade
+    from utils.face_cache import face_cache
+    from utils.snapshots import snapshot_writer
+    from utils.metrics import metrics
+    from utils.candidate_index import build_index
 
-face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + "haarcascade_frontalface_default.xml")
 recognizer = cv2.face.LBPHFaceRecognizer_create(radius=2, neighbors=8, grid_x=8, grid_y=8)
 
-def save_face_snapshot(student: dict, frame, face_coords, timestamp):
+def save_face_snapshot(student: dict, frame, face_coords, timestamp, margin=SNAPSHOT_MARGIN):
+    """Queue a crop around the face for the background writer; returns the target path or None if dropped."""
     (x, y, w, h) = face_coords
-    margin = 200
     x1, y1 = max(0, x - margin), max(0, y - margin)
     x2, y2 = min(frame.shape[1], x + w + margin), min(frame.shape[0], y + h + margin)
-    face_img = frame[y1:y2, x1:x2]
+    # Copy, the camera loop keeps drawing on the frame
+    face_img = frame[y1:y2, x1:x2].copy()
 
-    filename = f"{student['id']}-{timestamp.strftime('%Y%m%d%H%M%S')}.png"
-    filepath = os.path.join(LOGS_DIR, filename)
-    cv2.imwrite(filepath, face_img)
+    stem = f"{student['id']}-{timestamp.strftime('%Y%m%d%H%M%S')}"
+    return snapshot_writer.submit(stem, face_img, student['nama'])
 
-    log_message(f"📸 Snapshot saved for {student['nama']}: {filepath}")
-
-def predict_student(gray_face, students, threshold=70):
-    recognizer.read(MODEL_PATH)
-    face_resized = preprocess_face(gray_face)
+def predict_student(gray_face, students, threshold=RECOGNITION_THRESHOLD, aligned=False):
+    # aligned: gray_face is already a detector crop, only resize it
+    face_resized = align_face(gray_face) if aligned else preprocess_face(gray_face)
 
     if face_resized is None:
         return None, None
 
-    id_pred, conf = recognizer.predict(face_resized)
+    with metrics.stage("match"):
+        id_pred, conf = face_model.get().predict(face_resized)
 
     if conf < threshold:
         student = students.get(str(id_pred))
@@ -38,58 +52,132 @@ def predict_student(gray_face, students, threshold=70):
     else:
         return None, conf
 
+def predict_students(gray_faces, students, threshold=RECOGNITION_THRESHOLD, aligned=False):
+    """Batch version of predict_student, all detected faces are matched in one pass."""
+    results = [(None, None)] * len(gray_faces)
+    prepare = align_face if aligned else preprocess_face
+    faces = [prepare(img) if img is not None and img.size else None for img in gray_faces]
+    valid = [i for i, face in enumerate(faces) if face is not None]
+
+    if not valid:
+        return results
+
+    with metrics.stage("match"):
+        matches = face_model.get().match_many([faces[i] for i in valid], 1)
+    for i, match in zip(valid, matches):
+        if not match:
+            continue
+        id_pred, conf = match[0]
+        results[i] = (students.get(str(id_pred)), conf) if conf < threshold else (None, conf)
+
+    return results
+
+@metrics.timed("detect")
 def preprocess_face(img):
-    faces = face_cascade.detectMultiScale(img, scaleFactor=1.2, minNeighbors=5)
-    if len(faces) == 0:
-        return None
-    x, y, w, h = faces[0]
-    return cv2.resize(img[y:y+h, x:x+w], (200, 200))
-
-def train_model(log_box=None):
-    faces, labels = [], []
+    return crop_face(img, thread_cascade())
+
+def save_model(model, manifest):
+    # The index goes first, a reader reloading on the new model file must find a matching index
+    build_index(model)
+    # LBPHModel.save writes a temp file and renames it, so a reader never sees a partial model
+    model.save(MODEL_BIN_PATH)
+    manifest.save(MANIFEST_PATH)
+    face_model.invalidate()
+
+def lbph_params():
+    return {"radius": recognizer.getRadius(), "neighbors": recognizer.getNeighbors(),
+            "grid_x": recognizer.getGridX(), "grid_y": recognizer.getGridY()}
+
+def load_training_state(params):
+    """Current model and its manifest, or (None, None) when they cannot be reused."""
+    manifest = TrainingManifest.load(MANIFEST_PATH, params)
+    if manifest is None or not os.path.exists(MODEL_BIN_PATH):
+        return None, None
+    try:
+        model = LBPHModel.load(MODEL_BIN_PATH, mmap=False)
+    except (OSError, ValueError):
+        return None, None
+    if model.params != params or len(model.labels) != len(manifest.entries):
+        return None, None
+    return model, manifest
+
+def train_model(log_box=None, full=False):
     log_message("🔄 Collecting faces for training...", log_box)
+    params = lbph_params()
+    images = scan_images(IMAGES_DIR)
 
-    for student_id in os.listdir(IMAGES_DIR):
-        folder = os.path.join(IMAGES_DIR, student_id)
-        if not os.path.isdir(folder):
-            continue
+    model, manifest = (None, None) if full else load_training_state(params)
+    if manifest is None:
+        model, manifest = None, TrainingManifest(params)
+        log_message("🔁 Full training run", log_box)
 
-        for img_name in os.listdir(folder):
-            img_path = os.path.join(folder, img_name)
-            img = cv2.imread(img_path, cv2.IMREAD_GRAYSCALE)
-            if img is None:
-                log_message(f"⚠️ Could not read {img_path}", log_box)
-                continue
-
-            face = preprocess_face(img)
-            if face is None:
-                log_message(f"⚠️ No face detected in {img_name}", log_box)
-                continue
-
-            face = cv2.equalizeHist(face)
-            faces.append(face)
-            labels.append(int(student_id))
-
-    if faces:
-        recognizer.train(faces, np.array(labels))
-        recognizer.save(MODEL_PATH)
-        log_message(f"✅ Model trained with {len(faces)} samples and {len(set(labels))} students", log_box)
-    else:
-        log_message("❌ No valid images found, training aborted", log_box)
+    keep_rows, entries, skipped, todo = manifest.plan(images)
+    removed = len(manifest.entries) - len(keep_rows)
+    descriptors, labels = [], []
+
+    if todo:
+        log_message(f"🔍 Extracting faces from {len(todo)} image(s)...", log_box)
+
+    results = extract_faces(todo, lbph_params=params)
+    for done, (img_path, label, record, face, descriptor, error) in enumerate(results, start=1):
+        if error == "missing":
+            continue
+        if error == "unreadable":
+            log_message(f"⚠️ Could not read {img_path}", log_box)
+            skipped[img_path] = record
+        elif error == "no_face":
+            log_message(f"⚠️ No face detected in {os.path.basename(img_path)}", log_box)
+            skipped[img_path] = record
+        else:
+            descriptors.append(descriptor)
+            labels.append(label)
+            entries.append(record)
+
+        if done % 50 == 0:
+            log_message(f"⏳ Processed {done}/{len(todo)} images", log_box)
+
+    face_cache.prune()
+
+    if not entries:
+        if model is None and not os.path.exists(MODEL_BIN_PATH):
+            log_message("❌ No valid images found, training aborted", log_box)
+            return
+        # Every enrolled image is gone; keeping the old model would keep matching those students
+        save_model(LBPHModel(np.zeros((0, 0), np.float32), np.zeros(0, np.int32), **params),
+                   TrainingManifest(params, entries, skipped))
+        log_message(f"⚠️ No valid images left, saved an empty model ({removed} removed)", log_box)
+        return
+
+    if not descriptors and not removed and model is not None:
+        manifest.skipped = skipped
+        manifest.save(MANIFEST_PATH)
+        log_message(f"✅ Model already up to date ({len(entries)} samples)", log_box)
+        return
+
+    histograms = [np.asarray(model.histograms)[keep_rows]] if model is not None and keep_rows else []
+    kept_labels = [model.labels[keep_rows]] if model is not None and keep_rows else []
+    if descriptors:
+        # Only new images were described; their histograms are appended to the kept rows
+        histograms.append(np.vstack(descriptors))
+        kept_labels.append(np.array(labels, dtype=np.int32))
+
+    trained = LBPHModel(np.vstack(histograms), np.concatenate(kept_labels), **params)
+    save_model(trained, TrainingManifest(params, entries, skipped))
+    log_message(f"✅ Model trained with {len(trained.labels)} samples and {len(trained.classes)} students "
+                f"({len(descriptors)} new, {removed} removed)", log_box)
 
 def save_faces(student_id, photo_paths, folder, log_box=None):
     os.makedirs(folder, exist_ok=True)
     existing = len([f for f in os.listdir(folder) if f.endswith((".jpg", ".png", ".jpeg"))])
     count = 0
 
-    for i, photo_path in enumerate(photo_paths, start=existing + 1):
-        img = cv2.imread(photo_path, cv2.IMREAD_GRAYSCALE)
-        if img is None:
+    results = extract_faces([(photo_path, student_id) for photo_path in photo_paths], equalize=False)
+    for i, (photo_path, _, _, face, _, error) in enumerate(results, start=existing + 1):
+        if error in ("missing", "unreadable"):
             log_message(f"⚠️ Invalid file {photo_path}", log_box)
             continue
 
-        face = preprocess_face(img)
-        if face is None:
+        if error == "no_face":
             log_message(f"⚠️ No face in {photo_path}", log_box)
             continue
 
@@ -98,4 +186,5 @@ def save_faces(student_id, photo_paths, folder, log_box=None):
         count += 1
         log_message(f"✅ Saved face: {save_path}", log_box)
 
+    face_cache.prune()
     return count
\ No newline at end of file
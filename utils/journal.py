@@ -0,0 +1,151 @@
+import json, os, queue, threading, time
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    from config import JOURNAL_BATCH_SIZE, JOURNAL_FLUSH_INTERVAL
+    from data_manager import apply_attendance_events, journal_checkpoint, journal_path
+    from logger import log_message
+    from metrics import metrics
+except ImportError:
+    from utils.config import JOURNAL_BATCH_SIZE, JOURNAL_FLUSH_INTERVAL
+    from utils.data_manager import apply_attendance_events, journal_checkpoint, journal_path
+    from utils.logger import log_message
+    from utils.metrics import metrics
+
+
+class AttendanceJournal:
+    """Write-behind attendance log for the camera loop.
+
+    append() only queues the event. A background thread group-commits queued events
+    to an append-only file (one fsync per batch), applies the batch to storage and then
+    truncates the file. Events still in the file at startup are replayed, skipping any
+    sequence number storage already reports as applied.
+
+    Every writer process uses its own journal `name` (file and checkpoint), and the
+    file is locked while open, so two processes never replay or truncate each
+    other's events. Events are single check-ins rather than totals, and storage drops
+    one when another writer already recorded the student inside its window.
+    """
+
+    def __init__(self, name=None, batch_size=JOURNAL_BATCH_SIZE, flush_interval=JOURNAL_FLUSH_INTERVAL,
+                 apply=apply_attendance_events, checkpoint=journal_checkpoint):
+        self.name = name
+        self.path = journal_path(name)
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._apply = apply
+        self._checkpoint = checkpoint
+        self._queue = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = None
+        self._file = None
+        self._unapplied = []
+        self.seq = 0
+
+    def start(self):
+        self._file = open(self.path, "a", encoding="utf-8")
+        if fcntl:
+            try:
+                fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except OSError:
+                self._file.close()
+                raise RuntimeError(f"Attendance journal {self.path} is in use by another process")
+        self.replay()
+        self._thread = threading.Thread(target=self._run, name="attendance-journal", daemon=True)
+        self._thread.start()
+        return self
+
+    def append(self, student, status="Present", since=None):
+        # since: start of the duplicate window, see update_attendance_record
+        self._queue.put({
+            "id": int(student["id"]),
+            "nama": student["nama"],
+            "timestamp": student["waktu_kehadiran"],
+            "since": since,
+            "status": status,
+        })
+
+    def _read(self):
+        events = []
+        if not os.path.exists(self.path):
+            return events
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # A torn final line means the crash hit before its fsync, nothing after it is valid
+                    break
+        return events
+
+    def replay(self):
+        applied = self._checkpoint(self.name)
+        events = self._read()
+        self.seq = max([applied] + [e["seq"] for e in events])
+        pending = [e for e in events if e["seq"] > applied]
+
+        if pending:
+            applied = self._apply(pending, pending[-1]["seq"], self.name)
+            log_message(f"♻️ Replayed {len(pending)} attendance event(s) from journal")
+            self._log_duplicates(pending, applied)
+        if self._file:
+            self._file.truncate(0)
+        elif os.path.exists(self.path):
+            open(self.path, "w").close()
+        return len(pending)
+
+    def _run(self):
+        while not self._stop.is_set() or not self._queue.empty():
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                self._commit(batch)
+            except Exception as e:
+                log_message(f"❌ Attendance journal commit failed: {e}")
+
+    @metrics.timed("journal_commit")
+    def _commit(self, batch):
+        for event in batch:
+            self.seq += 1
+            event["seq"] = self.seq
+
+        self._file.write("".join(json.dumps(e, ensure_ascii=False) + "\n" for e in batch))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+        # Durable from here on; a failed apply is retried with the next batch and
+        # the file is only cleared once everything in it has reached storage
+        pending = self._unapplied + batch
+        self._unapplied = pending
+        applied = self._apply(pending, self.seq, self.name)
+        self._unapplied = []
+        self._file.truncate(0)
+        self._log_duplicates(pending, applied)
+
+    def _log_duplicates(self, events, applied):
+        if applied is not None and applied < len(events):
+            log_message(f"⏭️ {len(events) - applied} attendance event(s) already recorded by another process, skipped")
+
+    def close(self):
+        self._stop.set()
+        if self._thread:
+            self._thread.join()
+        if self._file:
+            self._file.close()
@@ -0,0 +1,231 @@
+import json, os, struct, sys, uuid
+import numpy as np
+import cv2
+
+try:
+    from config import MODEL_PATH, MODEL_BIN_PATH
+except ImportError:
+    from utils.config import MODEL_PATH, MODEL_BIN_PATH
+
+# Binary layout: MAGIC | uint32 header size | JSON header | int32 labels | float32 histograms.
+# Both arrays start on an ALIGN boundary so they can be memory-mapped directly.
+MAGIC = b"LBPHBIN1"
+ALIGN = 64
+FORMAT_VERSION = 1
+
+
+def _aligned(offset):
+    return (offset + ALIGN - 1) // ALIGN * ALIGN
+
+
+def lbph_histogram(face, radius=2, neighbors=8, grid_x=8, grid_y=8):
+    """NumPy port of OpenCV's extended LBP + spatial histogram, returns a float32 row vector."""
+    src = np.asarray(face, dtype=np.float32)
+    h, w = src.shape[0] - 2 * radius, src.shape[1] - 2 * radius
+    center = src[radius:radius + h, radius:radius + w]
+    codes = np.zeros((h, w), dtype=np.int32)
+    eps = np.finfo(np.float32).eps
+
+    for n in range(neighbors):
+        x = np.float32(radius * np.cos(2.0 * np.pi * n / float(neighbors)))
+        y = np.float32(-radius * np.sin(2.0 * np.pi * n / float(neighbors)))
+        fx, fy = int(np.floor(x)), int(np.floor(y))
+        cx, cy = int(np.ceil(x)), int(np.ceil(y))
+        ty, tx = y - np.float32(fy), x - np.float32(fx)
+        w1 = (np.float32(1) - tx) * (np.float32(1) - ty)
+        w2 = tx * (np.float32(1) - ty)
+        w3 = (np.float32(1) - tx) * ty
+        w4 = tx * ty
+
+        def shifted(dy, dx):
+            return src[radius + dy:radius + dy + h, radius + dx:radius + dx + w]
+
+        t = w1 * shifted(fy, fx) + w2 * shifted(fy, cx) + w3 * shifted(cy, fx) + w4 * shifted(cy, cx)
+        codes += (((t > center) | (np.abs(t - center) < eps)).astype(np.int32) << n)
+
+    patterns = 2 ** neighbors
+    cell_h, cell_w = h // grid_y, w // grid_x
+    cells = codes[:grid_y * cell_h, :grid_x * cell_w]
+    cells = cells.reshape(grid_y, cell_h, grid_x, cell_w).transpose(0, 2, 1, 3).reshape(grid_x * grid_y, -1)
+    cells = cells + (np.arange(grid_x * grid_y, dtype=np.int32) * patterns)[:, None]
+    counts = np.bincount(cells.ravel(), minlength=grid_x * grid_y * patterns)
+    return (counts * (1.0 / (cell_h * cell_w))).astype(np.float32)
+
+
+def chi_square_distances(queries, histograms, block_elements=1 << 16):
+    """OpenCV's HISTCMP_CHISQR_ALT between query histogram(s) and every row of `histograms`.
+
+    A single 1-D query gives an (N,) result, a (M, bins) batch gives (M, N). The training
+    matrix is streamed once in cache-sized row blocks and every query is scored against a
+    block while it is hot, so a batch costs roughly one pass over the matrix.
+    """
+    queries = np.asarray(queries, dtype=np.float32)
+    single = queries.ndim == 1
+    queries = queries.reshape(-1, queries.shape[-1])
+    out = np.empty((len(queries), len(histograms)), dtype=np.float64)
+    rows = max(1, block_elements // queries.shape[1])
+    diff = np.empty((rows, queries.shape[1]), dtype=np.float32)
+    total = np.empty_like(diff)
+    # Both bins are zero wherever the sum is zero, so a tiny offset replaces a masked divide
+    tiny = np.float32(1e-30)
+
+    for start in range(0, len(histograms), rows):
+        block = histograms[start:start + rows]
+        n = len(block)
+        d, t = diff[:n], total[:n]
+        for i in range(len(queries)):
+            np.subtract(block, queries[i], out=d)
+            np.square(d, out=d)
+            np.add(block, queries[i], out=t)
+            t += tiny
+            np.divide(d, t, out=d)
+            out[i, start:start + n] = d.sum(axis=1, dtype=np.float64)
+
+    out *= 2.0
+    return out[0] if single else out
+
+
+class LBPHModel:
+    """Trained LBPH histograms held as one contiguous (samples x bins) matrix."""
+
+    def __init__(self, histograms, labels, radius=2, neighbors=8, grid_x=8, grid_y=8, model_id=None):
+        self.histograms = histograms
+        self.labels = np.asarray(labels, dtype=np.int32).ravel()
+        self.radius = radius
+        self.neighbors = neighbors
+        self.grid_x = grid_x
+        self.grid_y = grid_y
+        # Ties derived files such as the candidate index to this exact set of rows
+        self.model_id = model_id or uuid.uuid4().hex
+        # Optional candidate index (see candidate_index.py), consulted before the exact search
+        self.index = None
+
+        # Rows grouped by label so per-student minimum distances are one reduceat call
+        self._order = np.argsort(self.labels, kind="stable")
+        self.classes, self._starts = np.unique(self.labels[self._order], return_index=True)
+
+    @property
+    def params(self):
+        return {"radius": self.radius, "neighbors": self.neighbors, "grid_x": self.grid_x, "grid_y": self.grid_y}
+
+    @classmethod
+    def from_recognizer(cls, recognizer):
+        histograms = recognizer.getHistograms()
+        matrix = np.vstack([h.reshape(1, -1) for h in histograms]).astype(np.float32) if histograms else \
+            np.zeros((0, 0), dtype=np.float32)
+        return cls(matrix, recognizer.getLabels(), recognizer.getRadius(), recognizer.getNeighbors(),
+                   recognizer.getGridX(), recognizer.getGridY())
+
+    @classmethod
+    def from_yaml(cls, path):
+        recognizer = cv2.face.LBPHFaceRecognizer_create()
+        recognizer.read(path)
+        return cls.from_recognizer(recognizer)
+
+    def describe(self, face):
+        return lbph_histogram(face, self.radius, self.neighbors, self.grid_x, self.grid_y)
+
+    def describe_many(self, faces):
+        return np.vstack([self.describe(face) for face in faces])
+
+    def predict(self, face):
+        if len(self.labels) == 0:
+            return -1, float("inf")
+        if self.index is not None:
+            (label, distance), = self.index.search(self, self.describe(face), 1)[0]
+            return label, distance
+        distances = chi_square_distances(self.describe(face), self.histograms)
+        best = int(np.argmin(distances))
+        return int(self.labels[best]), float(distances[best])
+
+    def top_k_from_distances(self, distances, k=1):
+        """Best `k` distinct labels per query row as [(label, distance), ...], nearest first."""
+        distances = np.atleast_2d(distances)
+        if len(self.labels) == 0:
+            return [[] for _ in distances]
+
+        per_label = np.minimum.reduceat(distances[:, self._order], self._starts, axis=1)
+        k = min(k, len(self.classes))
+        results = []
+        for row in per_label:
+            idx = np.argpartition(row, k - 1)[:k] if k < len(row) else np.arange(len(row))
+            idx = idx[np.argsort(row[idx], kind="stable")]
+            results.append([(int(self.classes[i]), float(row[i])) for i in idx])
+        return results
+
+    def top_k(self, face, k=3):
+        return self.match_many([face], k)[0]
+
+    def match_many(self, faces, k=1):
+        """Score a batch of aligned faces against the whole matrix in one pass."""
+        if not len(faces):
+            return []
+        if len(self.labels) == 0:
+            return [[] for _ in faces]
+        if self.index is not None:
+            return self.index.search(self, self.describe_many(faces), k)
+        distances = chi_square_distances(self.describe_many(faces), self.histograms)
+        return self.top_k_from_distances(distances, k)
+
+    def save(self, path):
+        rows = len(self.labels)
+        cols = self.histograms.shape[1] if rows else 0
+        header = dict(self.params, version=FORMAT_VERSION, rows=rows, cols=cols, model_id=self.model_id)
+
+        # The offsets depend on the header size, so settle them on a fixed-width placeholder first
+        header.update(labels_offset=0, histograms_offset=0)
+        size = len(json.dumps(header)) + 32
+        header["labels_offset"] = _aligned(len(MAGIC) + 4 + size)
+        header["histograms_offset"] = _aligned(header["labels_offset"] + rows * 4)
+        raw = json.dumps(header).encode("utf-8").ljust(size)
+
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(MAGIC + struct.pack("<I", len(raw)) + raw)
+            f.write(b"\0" * (header["labels_offset"] - f.tell()))
+            f.write(self.labels.astype("<i4").tobytes())
+            f.write(b"\0" * (header["histograms_offset"] - f.tell()))
+            np.ascontiguousarray(self.histograms, dtype="<f4").tofile(f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not an LBPH binary model")
+            (size,) = struct.unpack("<I", f.read(4))
+            header = json.loads(f.read(size).decode("utf-8"))
+
+        if header.get("version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported model format version {header.get('version')}")
+
+        rows, cols = header["rows"], header["cols"]
+        if rows == 0:
+            labels, histograms = np.zeros(0, np.int32), np.zeros((0, cols), np.float32)
+        elif mmap:
+            labels = np.array(np.memmap(path, "<i4", "r", header["labels_offset"], (rows,)))
+            histograms = np.memmap(path, "<f4", "r", header["histograms_offset"], (rows, cols))
+        else:
+            with open(path, "rb") as f:
+                f.seek(header["labels_offset"])
+                labels = np.fromfile(f, "<i4", rows)
+                f.seek(header["histograms_offset"])
+                histograms = np.fromfile(f, "<f4", rows * cols).reshape(rows, cols)
+
+        return cls(histograms, labels, header["radius"], header["neighbors"], header["grid_x"], header["grid_y"],
+                   header.get("model_id"))
+
+
+def convert_yaml_model(yaml_path=MODEL_PATH, bin_path=MODEL_BIN_PATH):
+    model = LBPHModel.from_yaml(yaml_path)
+    model.save(bin_path)
+    return model
+
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else MODEL_PATH
+    dst = sys.argv[2] if len(sys.argv) > 2 else MODEL_BIN_PATH
+    converted = convert_yaml_model(src, dst)
+    print(f"Converted {src} -> {dst} ({len(converted.labels)} histograms)")
@@ -1,20 +1,214 @@
-import datetime
+import atexit, datetime, json, os, queue, threading
 
 try:
-    from config import LOG_PATH
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+try:
+    from config import LOG_PATH, LOG_LEVEL, LOG_FORMAT, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_FLUSH_INTERVAL, LOG_UI_INTERVAL
 except ImportError:
-    from utils.config import LOG_PATH
+    from utils.config import LOG_PATH, LOG_LEVEL, LOG_FORMAT, LOG_MAX_BYTES, LOG_BACKUP_COUNT, LOG_FLUSH_INTERVAL, LOG_UI_INTERVAL
 
-def log_message(msg: str, log_box=None):
-    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    log_entry = f"[{timestamp}] {msg}"
+LEVELS = {"DEBUG": 10, "INFO": 20, "WARNING": 30, "ERROR": 40}
+BATCH_SIZE = 256
 
-    with open(LOG_PATH, "a", encoding="utf-8") as f:
-        f.write(log_entry + "\n")
 
-    if log_box:
+def format_text(record):
+    timestamp, level, msg = record
+    return f"[{timestamp}] {msg}" if level == "INFO" else f"[{timestamp}] {level}: {msg}"
+
+
+class LogWriter:
+    """Appends log records to a file from one background thread.
+
+    Records are queued by log_message and written in batches, one write and flush per
+    batch; the file is rotated to .1, .2, ... once it passes `max_bytes`.
+
+    The API, the daemon and spawned training workers all write the same path, so the
+    size is taken from the path rather than from our own handle, the file is reopened
+    when another process rotated or truncated it, and rotation runs under a lock file.
+    """
+
+    def __init__(self, path=LOG_PATH, fmt=LOG_FORMAT, max_bytes=LOG_MAX_BYTES, backup_count=LOG_BACKUP_COUNT,
+                 flush_interval=LOG_FLUSH_INTERVAL):
+        self.path = path
+        self.fmt = fmt
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._file = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+                self._thread.start()
+
+    def put(self, record):
+        self._ensure_started()
+        self._queue.put(record)
+
+    def format(self, record):
+        if self.fmt == "json":
+            timestamp, level, msg = record
+            return json.dumps({"time": timestamp, "level": level, "msg": msg}, ensure_ascii=False)
+        return format_text(record)
+
+    def _rotate(self):
+        self._file.close()
+        self._file = None
+        for i in range(self.backup_count - 1, 0, -1):
+            src = f"{self.path}.{i}"
+            if os.path.exists(src):
+                os.replace(src, f"{self.path}.{i + 1}")
+        if self.backup_count > 0:
+            os.replace(self.path, self.path + ".1")
+        else:
+            os.remove(self.path)
+
+    def _size(self):
+        """Size of the file at `path`, reopening our handle if it no longer points there."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            st = None
+        if self._file is not None and (st is None or not os.path.samestat(st, os.fstat(self._file.fileno()))):
+            self._file.close()
+            self._file = None
+        if self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+            st = os.fstat(self._file.fileno())
+        return st.st_size
+
+    def _write(self, records):
+        if self.max_bytes and self._size() >= self.max_bytes:
+            with open(self.path + ".lock", "a") as lock:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                # Another process may have rotated while we waited for the lock
+                if self._size() >= self.max_bytes:
+                    self._rotate()
+                    self._file = open(self.path, "a", encoding="utf-8")
+        elif self._file is None:
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write("".join(self.format(r) + "\n" for r in records))
+        self._file.flush()
+
+    def _run(self):
+        while True:
+            try:
+                batch = [self._queue.get(timeout=self.flush_interval)]
+            except queue.Empty:
+                continue
+            while len(batch) < BATCH_SIZE:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            stop = None in batch
+            records = [r for r in batch if r is not None and not isinstance(r, threading.Event)]
+            if records:
+                try:
+                    self._write(records)
+                except OSError:
+                    self._file = None
+            for item in batch:
+                if isinstance(item, threading.Event):
+                    item.set()
+                self._queue.task_done()
+            if stop:
+                if self._file:
+                    self._file.close()
+                    self._file = None
+                return
+
+    def flush(self, timeout=5):
+        """Block until everything queued so far is on disk."""
+        if self._thread is None or not self._thread.is_alive():
+            return
+        done = threading.Event()
+        self._queue.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join(timeout=5)
+
+
+class LogBoxPump:
+    """Coalesces log lines for a Tk text widget and inserts them from the Tk thread.
+
+    Any thread may add lines; the widget is only touched by pump(), which reschedules
+    itself with widget.after so each interval becomes a single insert.
+    """
+
+    def __init__(self, widget, interval=LOG_UI_INTERVAL):
+        self.widget = widget
+        self.interval = interval
+        self._lines = []
+        self._lock = threading.Lock()
+        self.started = False
+
+    def add(self, line):
+        with self._lock:
+            self._lines.append(line)
+
+    def start(self):
+        self.started = True
+        self.widget.after(self.interval, self.pump)
+
+    def pump(self):
+        with self._lock:
+            lines, self._lines = self._lines, []
         try:
-            log_box.insert("end", log_entry + "\n")
-            log_box.see("end")
+            if lines:
+                self.widget.insert("end", "".join(line + "\n" for line in lines))
+                self.widget.see("end")
+            self.widget.after(self.interval, self.pump)
         except Exception:
-            pass
\ No newline at end of file
+            # Widget destroyed, stop pumping
+            pass
+
+
+log_writer = LogWriter()
+_pumps = {}
+_pumps_lock = threading.Lock()
+atexit.register(log_writer.close)
+
+
+def attach_log_box(widget, interval=LOG_UI_INTERVAL):
+    """Start delivering log lines to `widget`; call from the Tk thread."""
+    with _pumps_lock:
+        pump = _pumps.get(id(widget))
+        if pump is None:
+            pump = _pumps[id(widget)] = LogBoxPump(widget, interval)
+    if not pump.started:
+        pump.start()
+    return pump
+
+
+def log_message(msg: str, log_box=None, level="INFO"):
+    if LEVELS.get(level, 20) < LEVELS.get(LOG_LEVEL, 20):
+        return
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    record = (timestamp, level, msg)
+    log_writer.put(record)
+
+    if log_box:
+        with _pumps_lock:
+            pump = _pumps.get(id(log_box))
+            if pump is None:
+                pump = _pumps[id(log_box)] = LogBoxPump(log_box)
+        pump.add(format_text(record))
+        if not pump.started and threading.current_thread() is threading.main_thread():
+            pump.start()
+
+
+def flush_logs():
+    log_writer.flush()
@@ -0,0 +1,193 @@
+import bisect, functools, threading, time
+from contextlib import contextmanager, nullcontext
+
+try:
+    from config import METRICS_ENABLED, METRICS_SUMMARY_INTERVAL
+except ImportError:
+    from utils.config import METRICS_ENABLED, METRICS_SUMMARY_INTERVAL
+
+# Seconds; covers a sub-millisecond decode up to a multi-second training step
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_NULL = nullcontext()
+
+
+class StageMetric:
+    """Latency histogram plus call and error counters for one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, error=False):
+        i = bisect.bisect_left(BUCKETS, seconds)
+        with self._lock:
+            self.buckets[i] += 1
+            self.count += 1
+            self.total += seconds
+            self.max = max(self.max, seconds)
+            if error:
+                self.errors += 1
+
+    def quantile(self, q):
+        """Upper bucket bound below which a fraction q of the observations fall."""
+        with self._lock:
+            counts, count = list(self.buckets), self.count
+        if not count:
+            return 0.0
+        target, seen = q * count, 0
+        for bound, n in zip(BUCKETS + (self.max,), counts):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class MetricsRegistry:
+    """Process-wide stage timings and event counters.
+
+    Work done in a process pool is recorded in that worker's own registry, so the API
+    only reports stages that run in its process (the default thread pool does).
+    """
+
+    def __init__(self, enabled=METRICS_ENABLED):
+        self.enabled = enabled
+        self.started = time.time()
+        self._stages = {}
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def stage_metric(self, name):
+        metric = self._stages.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._stages.setdefault(name, StageMetric(name))
+        return metric
+
+    @contextmanager
+    def _timed_block(self, name):
+        metric = self.stage_metric(name)
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            metric.observe(time.perf_counter() - start, error=True)
+            raise
+        metric.observe(time.perf_counter() - start)
+
+    def stage(self, name):
+        """Context manager timing a block as stage `name`; a shared no-op when disabled."""
+        return self._timed_block(name) if self.enabled else _NULL
+
+    def timed(self, name):
+        """Decorator form of stage(); leaves the function untouched when metrics are disabled."""
+        def decorate(fn):
+            if not self.enabled:
+                return fn
+            metric = self.stage_metric(name)
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    result = fn(*args, **kwargs)
+                except Exception:
+                    metric.observe(time.perf_counter() - start, error=True)
+                    raise
+                metric.observe(time.perf_counter() - start)
+                return result
+            return wrapper
+        return decorate
+
+    def count(self, name, n=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._stages), dict(self._counters)
+
+    def render_prometheus(self, gauges=None):
+        """Prometheus text exposition of every stage and counter; `gauges` adds {name: {labels: value}}."""
+        stages, counters = self.snapshot()
+        lines = [
+            "# HELP face_stage_seconds Latency of each processing stage.",
+            "# TYPE face_stage_seconds histogram",
+        ]
+        for name, metric in sorted(stages.items()):
+            with metric._lock:
+                buckets, count, total = list(metric.buckets), metric.count, metric.total
+            cumulative = 0
+            for bound, n in zip(BUCKETS, buckets):
+                cumulative += n
+                lines.append(f'face_stage_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+            lines.append(f'face_stage_seconds_bucket{{stage="{name}",le="+Inf"}} {count}')
+            lines.append(f'face_stage_seconds_sum{{stage="{name}"}} {total:.6f}')
+            lines.append(f'face_stage_seconds_count{{stage="{name}"}} {count}')
+
+        lines += ["# HELP face_stage_errors_total Calls of each stage that raised.", "# TYPE face_stage_errors_total counter"]
+        lines += [f'face_stage_errors_total{{stage="{name}"}} {m.errors}' for name, m in sorted(stages.items())]
+
+        lines += ["# HELP face_events_total Event counters.", "# TYPE face_events_total counter"]
+        lines += [f'face_events_total{{event="{name}"}} {value}' for name, value in sorted(counters.items())]
+
+        for gauge, samples in (gauges or {}).items():
+            lines.append(f"# TYPE {gauge} gauge")
+            for labels, value in samples.items():
+                label_text = ",".join(f'{k}="{v}"' for k, v in labels)
+                lines.append(f"{gauge}{{{label_text}}} {value}")
+
+        lines.append(f"face_uptime_seconds {time.time() - self.started:.0f}")
+        return "\n".join(lines) + "\n"
+
+    def summary(self):
+        """One line per stage: calls, errors, rate, mean / p50 / p95 / max in ms."""
+        stages, counters = self.snapshot()
+        uptime = max(1e-9, time.time() - self.started)
+        lines = []
+        for name, m in sorted(stages.items()):
+            if not m.count:
+                continue
+            lines.append(
+                f"{name}: {m.count} calls ({m.count / uptime:.1f}/s), {m.errors} errors, "
+                f"mean {1000 * m.total / m.count:.1f} ms, p50 {1000 * m.quantile(0.5):.1f} ms, "
+                f"p95 {1000 * m.quantile(0.95):.1f} ms, max {1000 * m.max:.1f} ms"
+            )
+        lines += [f"{name}: {value}" for name, value in sorted(counters.items())]
+        return lines
+
+
+class SummaryReporter:
+    """Background thread handing metrics.summary() to `report` every `interval` seconds."""
+
+    def __init__(self, report, interval=METRICS_SUMMARY_INTERVAL, registry=None):
+        self.report = report
+        self.interval = interval
+        self.registry = registry or metrics
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self.registry.enabled and self.interval:
+            self._thread = threading.Thread(target=self._run, name="metrics-summary", daemon=True)
+            self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            lines = self.registry.summary()
+            if lines:
+                self.report("📊 " + " | ".join(lines))
+
+    def stop(self):
+        self._stop.set()
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,108 @@
+import os, threading, time
+import cv2
+
+try:
+    from config import MODEL_PATH, MODEL_BIN_PATH, MODEL_SHARING
+    from logger import log_message
+    from lbph_model import LBPHModel, convert_yaml_model
+    from candidate_index import CentroidIndex, load_index, wants_index
+    from shared_model import SharedModelStore
+except ImportError:
+    from utils.config import MODEL_PATH, MODEL_BIN_PATH, MODEL_SHARING
+    from utils.logger import log_message
+    from utils.lbph_model import LBPHModel, convert_yaml_model
+    from utils.candidate_index import CentroidIndex, load_index, wants_index
+    from utils.shared_model import SharedModelStore
+
+
+class ModelHolder:
+    """Keeps the trained model resident and swaps in a new one when the model file changes.
+
+    With sharing="shm" the stamp is the version of the copy published in shared memory
+    (see shared_model.py), so every process swaps to the same version without each one
+    reading the file.
+    """
+
+    def __init__(self, path=MODEL_BIN_PATH, legacy_path=MODEL_PATH, check_interval=1.0, sharing=MODEL_SHARING):
+        self.path = path
+        self.legacy_path = legacy_path
+        self.check_interval = check_interval
+        self.sharing = sharing
+        self.shared = SharedModelStore() if sharing == "shm" else None
+        self.version = 0
+        self._model = None
+        self._stamp = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def _file_stamp(self):
+        if self.shared is not None:
+            return self.shared.sync(self.path)
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def _load(self):
+        if self.shared is not None:
+            _, model = self.shared.attach()
+        else:
+            # Windows cannot replace a file that is still mapped, so read it into memory there
+            model = LBPHModel.load(self.path, mmap=self.sharing == "mmap" and os.name != "nt")
+        model.index = load_index(model)
+        if model.index is None and wants_index(model):
+            # Model trained before the index existed, or the index file went missing
+            log_message(f"🗂️ Building candidate index for {len(model.classes)} students...")
+            model.index = CentroidIndex.build(model)
+            try:
+                model.index.save()
+            except OSError:
+                pass
+        return model
+
+    def _migrate_legacy(self):
+        if self.legacy_path and os.path.exists(self.legacy_path):
+            log_message(f"🔄 Converting {self.legacy_path} to binary model {self.path}...")
+            convert_yaml_model(self.legacy_path, self.path)
+
+    def get(self):
+        model = self._model
+        if model is not None and time.monotonic() < self._next_check:
+            return model
+
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            stamp = self._file_stamp()
+            if stamp is None and self._model is None:
+                self._migrate_legacy()
+                stamp = self._file_stamp()
+
+            if stamp is None:
+                if self._model is None:
+                    raise FileNotFoundError(f"Model not found at {self.path}, train the model first")
+                return self._model
+
+            if stamp != self._stamp or self._model is None:
+                try:
+                    loaded = self._load()
+                except (cv2.error, ValueError, OSError) as e:
+                    if self._model is None:
+                        raise
+                    log_message(f"⚠️ Could not reload model, keeping version {self.version}: {e}")
+                    return self._model
+
+                # Publish the fully loaded model with a single reference swap so
+                # concurrent callers see either the old model or the new one.
+                self._model = loaded
+                self._stamp = stamp
+                self.version = stamp if self.shared is not None else self.version + 1
+                log_message(f"🧠 Model loaded (version {self.version})")
+
+            return self._model
+
+    def invalidate(self):
+        self._next_check = 0.0
+
+
+face_model = ModelHolder()
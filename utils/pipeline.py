@@ -0,0 +1,71 @@
+import threading, time
+from collections import deque
+
+
+class LatestQueue:
+    """Small bounded queue between pipeline stages that drops the oldest item when full.
+
+    A slow consumer therefore always sees the most recent frames instead of an
+    ever-growing backlog, and a producer never blocks.
+    """
+
+    def __init__(self, maxsize=2):
+        self._items = deque(maxlen=maxsize)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append(item)
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            return self._items.popleft() if self._items else None
+
+    def get_latest(self):
+        """Newest item without waiting, discarding anything older; None if empty."""
+        with self._cond:
+            if not self._items:
+                return None
+            item = self._items.pop()
+            self.dropped += len(self._items)
+            self._items.clear()
+            return item
+
+    def __len__(self):
+        return len(self._items)
+
+
+class RateMeter:
+    """Events per second over a sliding window."""
+
+    def __init__(self, window=2.0):
+        self.window = window
+        self._times = deque()
+        self._lock = threading.Lock()
+
+    def tick(self):
+        now = time.monotonic()
+        with self._lock:
+            self._times.append(now)
+            while self._times and now - self._times[0] > self.window:
+                self._times.popleft()
+
+    @property
+    def rate(self):
+        with self._lock:
+            if len(self._times) < 2:
+                return 0.0
+            span = self._times[-1] - self._times[0]
+            return (len(self._times) - 1) / span if span > 0 else 0.0
+
+
+def start_stage(name, target, *args):
+    thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,153 @@
+import struct
+import cv2, numpy as np
+
+try:
+    from config import RECOGNITION_THRESHOLD, DECODE_MIN_SIDE
+    from face_utils import preprocess_face
+    from face_pipeline import align_face, detect_faces, thread_cascade
+    from model_store import face_model
+    from metrics import metrics
+except ImportError:
+    from utils.config import RECOGNITION_THRESHOLD, DECODE_MIN_SIDE
+    from utils.face_utils import preprocess_face
+    from utils.face_pipeline import align_face, detect_faces, thread_cascade
+    from utils.model_store import face_model
+    from utils.metrics import metrics
+
+# Raw payload: RAW_MAGIC | uint16 width | uint16 height (little endian) | width*height 8-bit gray pixels
+RAW_MAGIC = b"GRAY"
+RAW_HEADER = struct.Struct("<4sHH")
+REDUCED_FLAGS = ((8, cv2.IMREAD_REDUCED_GRAYSCALE_8), (4, cv2.IMREAD_REDUCED_GRAYSCALE_4),
+                 (2, cv2.IMREAD_REDUCED_GRAYSCALE_2))
+# JPEG start-of-frame markers, every SOFn except DHT (C4), JPG (C8) and DAC (CC)
+JPEG_SOF = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def raw_payload(gray):
+    """Encode a 2-D uint8 array as a raw payload, for clients that skip JPEG entirely."""
+    h, w = gray.shape
+    return RAW_HEADER.pack(RAW_MAGIC, w, h) + np.ascontiguousarray(gray, dtype=np.uint8).tobytes()
+
+
+def image_size(data: bytes):
+    """(width, height) read from a PNG or JPEG header without decoding, None for other formats."""
+    if data[:8] == b"\x89PNG\r\n\x1a\n" and len(data) >= 24:
+        return struct.unpack(">II", data[16:24])
+    if data[:2] != b"\xff\xd8":
+        return None
+    i = 2
+    while i + 9 < len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            i += 1
+            continue
+        if marker in JPEG_SOF:
+            h, w = struct.unpack(">HH", data[i + 5:i + 9])
+            return w, h
+        if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+            i += 2
+            continue
+        i += 2 + struct.unpack(">H", data[i + 2:i + 4])[0]
+    return None
+
+
+def decode_flag(size, min_side=DECODE_MIN_SIDE):
+    """Largest IMREAD_REDUCED_GRAYSCALE_* that keeps min_side pixels on the short side, as (factor, flag)."""
+    if size and min_side:
+        short = min(size)
+        for factor, flag in REDUCED_FLAGS:
+            if short // factor >= min_side:
+                return factor, flag
+    return 1, cv2.IMREAD_GRAYSCALE
+
+
+def decode_raw(data: bytes):
+    if len(data) < RAW_HEADER.size:
+        return None
+    _, w, h = RAW_HEADER.unpack_from(data)
+    if w == 0 or h == 0 or len(data) - RAW_HEADER.size != w * h:
+        return None
+    return np.frombuffer(data, np.uint8, w * h, RAW_HEADER.size).reshape(h, w)
+
+
+@metrics.timed("decode")
+def decode_image_scaled(data: bytes):
+    """Grayscale image and the factor it was shrunk by (1 = full resolution); (None, 1) when undecodable.
+
+    JPEG and PNG headers are parsed first so large photos are decoded straight at
+    1/2, 1/4 or 1/8 size; JPEG does that inside the DCT, which is much cheaper than a
+    full decode. Raw payloads (see raw_payload) are used as is.
+    """
+    if not data:
+        return None, 1
+    if data[:4] == RAW_MAGIC:
+        return decode_raw(data), 1
+    factor, flag = decode_flag(image_size(data))
+    img = cv2.imdecode(np.frombuffer(data, np.uint8), flag)
+    if img is None and flag != cv2.IMREAD_GRAYSCALE:
+        # Header lied about the size or the codec refused the reduced mode
+        factor, img = 1, cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_GRAYSCALE)
+    return img, factor
+
+
+def decode_image(data: bytes):
+    return decode_image_scaled(data)[0]
+
+
+def recognize_payloads(payloads, top_k=1):
+    """Decode, detect and match encoded images, returns one {"decoded", "matches"} dict per payload.
+
+    Only plain data goes in and out so this can run in a thread or a process pool worker.
+    """
+    images = [decode_image(data) for data in payloads]
+    faces = [preprocess_face(img) if img is not None else None for img in images]
+    valid = [i for i, face in enumerate(faces) if face is not None]
+
+    results = [{"decoded": img is not None, "matches": []} for img in images]
+    if valid:
+        with metrics.stage("match"):
+            matched = face_model.get().match_many([faces[i] for i in valid], top_k)
+        for i, matches in zip(valid, matched):
+            results[i]["matches"] = matches
+    return results
+
+
+def track_frame(data, tracker, top_k=1, threshold=RECOGNITION_THRESHOLD):
+    """Detect every face in one encoded frame, advance `tracker` and recognize only the tracks that need it.
+
+    Returns (tracker, faces) with one dict per face: track id, box, label (None when
+    unknown), confidence, and whether it was recognized on this frame and changed
+    identity. faces is None when the frame cannot be decoded. The tracker is handed
+    back so this also works in a process pool, where it travels as a copy.
+    """
+    gray, factor = decode_image_scaled(data)
+    if gray is None:
+        return tracker, None
+
+    with metrics.stage("detect"):
+        boxes = detect_faces(gray, thread_cascade())
+    tracks = tracker.update(boxes)
+    pending = [t for t in tracks if tracker.needs_recognition(t)]
+    changed = set()
+
+    if pending:
+        with metrics.stage("match"):
+            matched = face_model.get().match_many([align_face(gray[y:y+h, x:x+w]) for x, y, w, h in (t.box for t in pending)], top_k)
+        for track, matches in zip(pending, matched):
+            label, conf = matches[0] if matches else (None, None)
+            identity = {"id": str(label)} if label is not None and conf < threshold else None
+            if track.set_identity(identity, conf):
+                changed.add(track.id)
+
+    recognized = {t.id for t in pending}
+    return tracker, [{
+        "track": t.id,
+        # Boxes in the coordinates of the frame that was sent, not the reduced decode
+        "box": [v * factor for v in t.box],
+        "label": t.student["id"] if t.student else None,
+        "confidence": t.conf,
+        "recognized": t.id in recognized,
+        "changed": t.id in changed,
+    } for t in tracks]
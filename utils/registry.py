@@ -0,0 +1,73 @@
+import threading, time
+
+try:
+    from data_manager import load_students, students_stamp, attendance_stamp, load_counters
+    from logger import log_message
+except ImportError:
+    from utils.data_manager import load_students, students_stamp, attendance_stamp, load_counters
+    from utils.logger import log_message
+
+
+class StudentRegistry:
+    """Id-indexed students kept in memory and refreshed when the backing store changes.
+
+    Attendance written by any process (API, kiosk, daemon, journal replay) only
+    refreshes the counters of the students it touched, in place.
+    """
+
+    def __init__(self, load=load_students, stamp=students_stamp, attendance=attendance_stamp,
+                 counters=load_counters, check_interval=1.0):
+        self._load = load
+        self._stamp_fn = stamp
+        self._attendance_fn = attendance
+        self._counters = counters
+        self.check_interval = check_interval
+        self._students = {}
+        self._stamp = None
+        self._attendance = None
+        self._next_check = 0.0
+        self._lock = threading.Lock()
+
+    def refresh(self, force=False):
+        with self._lock:
+            self._next_check = time.monotonic() + self.check_interval
+            stamp = self._stamp_fn()
+            # Read before loading, so rows written meanwhile are picked up by the next check
+            attendance = self._attendance_fn()
+            if stamp == self._stamp and not force:
+                if attendance == self._attendance:
+                    return False
+                for sid, counters in self._counters(self._attendance).items():
+                    if sid in self._students:
+                        self._students[sid].update(counters)
+                self._attendance = attendance
+                return True
+
+            fresh = self._load() if stamp is not None else {}
+            current = self._students
+            # Keep the existing dict for rows that did not change so references held
+            # by in-flight requests stay attached to the registry
+            merged = {sid: current[sid] if current.get(sid) == row else row for sid, row in fresh.items()}
+            changed = sum(1 for sid, row in merged.items() if current.get(sid) is not row)
+            removed = len(current.keys() - merged.keys())
+
+            self._students = merged
+            self._stamp = stamp
+            self._attendance = attendance
+            if changed or removed:
+                log_message(f"🔄 Student registry refreshed ({changed} changed, {removed} removed, {len(merged)} total)")
+            return True
+
+    def students(self):
+        if time.monotonic() >= self._next_check:
+            self.refresh()
+        return self._students
+
+    def get(self, student_id):
+        return self.students().get(str(student_id))
+
+    def __len__(self):
+        return len(self.students())
+
+
+student_registry = StudentRegistry()
@@ -0,0 +1,187 @@
+import hashlib, json, os, time
+import numpy as np
+from multiprocessing import shared_memory
+
+try:
+    from config import SHARED_MODEL_PATH, DATA_DIR
+    from lbph_model import LBPHModel
+except ImportError:
+    from utils.config import SHARED_MODEL_PATH, DATA_DIR
+    from utils.lbph_model import LBPHModel
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+ALIGN = 64
+# Segments kept alive besides the current one, for workers that have not swapped yet
+KEEP_PREVIOUS = 1
+
+
+def _open_segment(name, create=False, size=0):
+    try:
+        shm = shared_memory.SharedMemory(name=name, create=create, size=size, track=False)
+    except TypeError:
+        # Before Python 3.13 the resource tracker unlinks every segment a process touched
+        # when it exits, which would pull the model from under the other workers
+        shm = shared_memory.SharedMemory(name=name, create=create, size=size)
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+    return shm
+
+
+def _unlink(name):
+    # SharedMemory.unlink() would unregister the segment from the resource tracker a
+    # second time (_open_segment already did), which makes the tracker print a KeyError
+    try:
+        import _posixshmem
+    except ImportError:
+        # Windows frees a segment when its last handle closes, there is nothing to unlink
+        return
+    try:
+        _posixshmem.shm_unlink("/" + name)
+    except FileNotFoundError:
+        pass
+
+
+class _Segment:
+    """Keeps a shared memory mapping open while arrays built on it are alive."""
+
+    def __init__(self, shm):
+        self.shm = shm
+
+    def __del__(self):
+        try:
+            self.shm.close()
+        except (BufferError, OSError):
+            pass
+
+
+class SharedModelStore:
+    """One read-only copy of the model's labels and histograms in POSIX shared memory.
+
+    A small registry file holds the current version, the segment name and the layout.
+    Whichever process first notices that the model file is newer than the published
+    copy takes a file lock, loads the file once and publishes it under the next version;
+    every other process just attaches to the segment when the registry version moves.
+    """
+
+    def __init__(self, registry_path=SHARED_MODEL_PATH):
+        self.registry_path = registry_path
+        self.lock_path = registry_path + ".lock"
+        # Distinct deployments on one host must not share segment names
+        self.prefix = "face_model_" + hashlib.sha1(os.path.abspath(DATA_DIR).encode()).hexdigest()[:8]
+
+    def read(self):
+        try:
+            with open(self.registry_path, encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _write(self, registry):
+        tmp_path = self.registry_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(registry, f)
+        os.replace(tmp_path, self.registry_path)
+
+    def sync(self, model_path):
+        """Publish `model_path` if the shared copy is missing or older; returns the current version or None."""
+        try:
+            st = os.stat(model_path)
+            source = [st.st_mtime_ns, st.st_size]
+        except FileNotFoundError:
+            source = None
+
+        registry = self.read()
+        if source is None or (registry and registry["source"] == source):
+            return registry["version"] if registry else None
+
+        with open(self.lock_path, "a") as lock:
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                # Another worker may have published while we waited for the lock
+                registry = self.read()
+                if registry and registry["source"] == source:
+                    return registry["version"]
+                return self.publish(LBPHModel.load(model_path, mmap=False), source, registry)["version"]
+            finally:
+                if fcntl:
+                    fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def publish(self, model, source, previous=None):
+        version = (previous["version"] if previous else 0) + 1
+        rows = len(model.labels)
+        cols = model.histograms.shape[1] if rows else 0
+        histograms_offset = (rows * 4 + ALIGN - 1) // ALIGN * ALIGN
+        size = max(1, histograms_offset + rows * cols * 4)
+        name = f"{self.prefix}_{version}_{os.getpid()}"
+
+        shm = _open_segment(name, create=True, size=size)
+        np.ndarray((rows,), "<i4", shm.buf, 0)[:] = model.labels
+        np.ndarray((rows, cols), "<f4", shm.buf, histograms_offset)[:] = model.histograms
+        shm.close()
+
+        segments = ((previous or {}).get("segments", []) + [name])
+        for stale in segments[:-(KEEP_PREVIOUS + 1)]:
+            _unlink(stale)
+
+        registry = {
+            "version": version, "name": name, "source": source, "published": time.time(),
+            "rows": rows, "cols": cols, "histograms_offset": histograms_offset,
+            "params": model.params, "model_id": model.model_id,
+            "segments": segments[-(KEEP_PREVIOUS + 1):],
+        }
+        self._write(registry)
+        return registry
+
+    def attach(self, registry=None):
+        """LBPHModel whose arrays live in the published segment; returns (version, model)."""
+        registry = registry or self.read()
+        if registry is None:
+            raise FileNotFoundError("No shared model has been published yet")
+
+        shm = _open_segment(registry["name"])
+        rows, cols = registry["rows"], registry["cols"]
+        labels = np.ndarray((rows,), "<i4", shm.buf, 0)
+        histograms = np.ndarray((rows, cols), "<f4", shm.buf, registry["histograms_offset"])
+        histograms.flags.writeable = False
+
+        model = LBPHModel(histograms, np.array(labels), model_id=registry["model_id"], **registry["params"])
+        model.segment = _Segment(shm)
+        return registry["version"], model
+
+    def unpublish(self):
+        """Remove every segment and the registry, e.g. when switching back to file mode."""
+        registry = self.read()
+        for name in (registry or {}).get("segments", []):
+            _unlink(name)
+        if registry:
+            os.remove(self.registry_path)
+
+
+if __name__ == "__main__":
+    # python -m utils.shared_model [status | publish | unpublish]
+    import sys
+    try:
+        from config import MODEL_BIN_PATH
+    except ImportError:
+        from utils.config import MODEL_BIN_PATH
+
+    store = SharedModelStore()
+    command = sys.argv[1] if len(sys.argv) > 1 else "status"
+    if command == "publish":
+        print(f"Shared model version {store.sync(MODEL_BIN_PATH)}")
+    elif command == "unpublish":
+        store.unpublish()
+        print("Shared model segments removed")
+    elif command == "status":
+        registry = store.read()
+        print(json.dumps({k: v for k, v in registry.items() if k != "params"}, indent=2) if registry else "Nothing published")
+    else:
+        raise SystemExit(f"Unknown command {command}, use status, publish or unpublish")
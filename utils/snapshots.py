@@ -0,0 +1,145 @@
+import os, queue, threading, time
+import cv2
+
+try:
+    from config import (LOGS_DIR, SNAPSHOT_FORMAT, SNAPSHOT_QUALITY, SNAPSHOT_QUEUE_SIZE,
+                        SNAPSHOT_MAX_BYTES, SNAPSHOT_MAX_AGE_DAYS, SNAPSHOT_PRUNE_INTERVAL)
+    from logger import log_message
+except ImportError:
+    from utils.config import (LOGS_DIR, SNAPSHOT_FORMAT, SNAPSHOT_QUALITY, SNAPSHOT_QUEUE_SIZE,
+                              SNAPSHOT_MAX_BYTES, SNAPSHOT_MAX_AGE_DAYS, SNAPSHOT_PRUNE_INTERVAL)
+    from utils.logger import log_message
+
+SNAPSHOT_EXTENSIONS = (".jpg", ".webp", ".png")
+
+
+def encode_params(fmt, quality):
+    if fmt == "jpg":
+        return [cv2.IMWRITE_JPEG_QUALITY, quality]
+    if fmt == "webp":
+        return [cv2.IMWRITE_WEBP_QUALITY, quality]
+    if fmt == "png":
+        return [cv2.IMWRITE_PNG_COMPRESSION, 3]
+    raise ValueError(f"Unsupported snapshot format: {fmt}")
+
+
+def find_snapshot(folder, stem):
+    """Snapshot file for `stem` in any supported format, or None."""
+    for ext in SNAPSHOT_EXTENSIONS:
+        path = os.path.join(folder, stem + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+class SnapshotWriter:
+    """Encodes and writes attendance snapshots on a background thread.
+
+    submit() never blocks the camera loop: when the queue is full the snapshot is
+    dropped and counted. The same thread prunes LOGS_DIR every `prune_interval`
+    seconds, removing snapshots older than `max_age_days` and then the oldest ones
+    until the folder fits in `max_bytes`.
+    """
+
+    def __init__(self, folder=LOGS_DIR, fmt=SNAPSHOT_FORMAT, quality=SNAPSHOT_QUALITY, queue_size=SNAPSHOT_QUEUE_SIZE,
+                 max_bytes=SNAPSHOT_MAX_BYTES, max_age_days=SNAPSHOT_MAX_AGE_DAYS, prune_interval=SNAPSHOT_PRUNE_INTERVAL):
+        self.folder = folder
+        self.fmt = fmt.lower().lstrip(".").replace("jpeg", "jpg")
+        self.params = encode_params(self.fmt, quality)
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400 if max_age_days else None
+        self.prune_interval = prune_interval
+        self.dropped = 0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._thread = None
+        self._lock = threading.Lock()
+        self._last_prune = 0.0
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="snapshot-writer", daemon=True)
+                self._thread.start()
+
+    def submit(self, stem, image, label=""):
+        """Queue `image` to be written as <stem>.<fmt>; returns the target path, or None if dropped."""
+        self._ensure_started()
+        path = os.path.join(self.folder, f"{stem}.{self.fmt}")
+        try:
+            self._queue.put_nowait((path, image, label))
+        except queue.Full:
+            self.dropped += 1
+            return None
+        return path
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.prune_interval)
+            except queue.Empty:
+                item = ()
+            if item is None:
+                break
+            if item:
+                self._write(*item)
+                self._queue.task_done()
+            if time.monotonic() - self._last_prune >= self.prune_interval:
+                self.prune()
+
+    def _write(self, path, image, label):
+        ok, buf = cv2.imencode("." + self.fmt, image, self.params)
+        if not ok:
+            log_message(f"❌ Failed to encode snapshot: {path}")
+            return
+        tmp_path = path + ".tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                f.write(buf.tobytes())
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log_message(f"❌ Failed to save snapshot {path}: {e}")
+            return
+        log_message(f"📸 Snapshot saved for {label}: {path}")
+
+    def prune(self):
+        """Apply the age and size budget to the snapshot folder; returns the number of files removed."""
+        self._last_prune = time.monotonic()
+        entries, total = [], 0
+        for name in os.listdir(self.folder):
+            if not name.lower().endswith(SNAPSHOT_EXTENSIONS):
+                continue
+            path = os.path.join(self.folder, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            entries.append((st.st_mtime, st.st_size, path))
+            total += st.st_size
+
+        removed, now = 0, time.time()
+        for mtime, size, path in sorted(entries):
+            expired = self.max_age is not None and now - mtime > self.max_age
+            if not expired and (not self.max_bytes or total <= self.max_bytes):
+                break
+            try:
+                os.remove(path)
+                total -= size
+                removed += 1
+            except OSError:
+                pass
+
+        if removed:
+            log_message(f"🧹 Pruned {removed} old snapshots from {self.folder}")
+        return removed
+
+    def flush(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.join()
+
+    def close(self):
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+
+
+snapshot_writer = SnapshotWriter()
@@ -0,0 +1,447 @@
+import base64, os, sqlite3, sys, threading
+import pandas as pd
+
+try:
+    from config import DB_PATH, CSV_PATH, ATTENDANCE_PATH
+    from logger import log_message
+except ImportError:
+    from utils.config import DB_PATH, CSV_PATH, ATTENDANCE_PATH
+    from utils.logger import log_message
+
+STUDENT_COLUMNS = ["id", "nama", "kelas", "total_kehadiran", "email", "nomor_telepon", "waktu_kehadiran"]
+ATTENDANCE_COLUMNS = ["id", "name", "timestamp", "status"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS students (
+    id INTEGER PRIMARY KEY,
+    nama TEXT,
+    kelas TEXT,
+    total_kehadiran INTEGER NOT NULL DEFAULT 0,
+    email TEXT,
+    nomor_telepon INTEGER,
+    waktu_kehadiran TEXT
+);
+CREATE TABLE IF NOT EXISTS attendance (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    student_id INTEGER NOT NULL,
+    name TEXT,
+    timestamp TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'Present',
+    kelas TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_attendance_student ON attendance (student_id, timestamp);
+CREATE INDEX IF NOT EXISTS idx_attendance_timestamp ON attendance (timestamp);
+
+CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('students_version', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('journal_seq', 0);
+INSERT OR IGNORE INTO meta (key, value) VALUES ('schema_version', 0);
+CREATE TRIGGER IF NOT EXISTS students_version_ins AFTER INSERT ON students
+    BEGIN UPDATE meta SET value = value + 1 WHERE key = 'students_version'; END;
+-- Attendance counter updates leave the version alone, so check-ins do not make every
+-- StudentRegistry reload the whole table
+CREATE TRIGGER IF NOT EXISTS students_version_upd AFTER UPDATE OF id, nama, kelas, email, nomor_telepon ON students
+    BEGIN UPDATE meta SET value = value + 1 WHERE key = 'students_version'; END;
+CREATE TRIGGER IF NOT EXISTS students_version_del AFTER DELETE ON students
+    BEGIN UPDATE meta SET value = value + 1 WHERE key = 'students_version'; END;
+"""
+
+
+def _add_attendance_kelas(conn):
+    if "kelas" not in {row[1] for row in conn.execute("PRAGMA table_info(attendance)")}:
+        conn.execute("ALTER TABLE attendance ADD COLUMN kelas TEXT")
+    conn.execute("UPDATE attendance SET kelas = (SELECT kelas FROM students WHERE students.id = attendance.student_id) "
+                 "WHERE kelas IS NULL")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_attendance_kelas ON attendance (kelas, timestamp)")
+
+
+ROLLUP_SCHEMA = """
+CREATE TABLE IF NOT EXISTS daily_student (
+    day TEXT NOT NULL,
+    student_id INTEGER NOT NULL,
+    kelas TEXT NOT NULL DEFAULT '',
+    records INTEGER NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    PRIMARY KEY (day, student_id)
+);
+CREATE INDEX IF NOT EXISTS idx_daily_student_student ON daily_student (student_id, day);
+CREATE TABLE IF NOT EXISTS daily_class (
+    day TEXT NOT NULL,
+    kelas TEXT NOT NULL DEFAULT '',
+    records INTEGER NOT NULL,
+    students INTEGER NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    PRIMARY KEY (day, kelas)
+);
+CREATE INDEX IF NOT EXISTS idx_daily_class_kelas ON daily_class (kelas, day);
+-- Runs inside the statement that inserts the attendance row, so the rollups commit or
+-- roll back together with it. daily_class goes first: it counts the student only when
+-- there is no daily_student row for that day yet.
+CREATE TRIGGER IF NOT EXISTS attendance_rollup AFTER INSERT ON attendance
+BEGIN
+    INSERT INTO daily_class (day, kelas, records, students, first_seen, last_seen)
+    VALUES (substr(NEW.timestamp, 1, 10), COALESCE(NEW.kelas, ''), 1,
+            NOT EXISTS (SELECT 1 FROM daily_student WHERE day = substr(NEW.timestamp, 1, 10) AND student_id = NEW.student_id),
+            NEW.timestamp, NEW.timestamp)
+    ON CONFLICT (day, kelas) DO UPDATE SET
+        records = records + 1, students = students + excluded.students,
+        first_seen = min(first_seen, excluded.first_seen), last_seen = max(last_seen, excluded.last_seen);
+    INSERT INTO daily_student (day, student_id, kelas, records, first_seen, last_seen)
+    VALUES (substr(NEW.timestamp, 1, 10), NEW.student_id, COALESCE(NEW.kelas, ''), 1, NEW.timestamp, NEW.timestamp)
+    ON CONFLICT (day, student_id) DO UPDATE SET
+        records = records + 1,
+        first_seen = min(first_seen, excluded.first_seen), last_seen = max(last_seen, excluded.last_seen);
+END;
+"""
+
+REBUILD_ROLLUPS = """
+DELETE FROM daily_class;
+DELETE FROM daily_student;
+INSERT INTO daily_student (day, student_id, kelas, records, first_seen, last_seen)
+    SELECT substr(timestamp, 1, 10), student_id, COALESCE(min(kelas), ''), count(*), min(timestamp), max(timestamp)
+    FROM attendance GROUP BY substr(timestamp, 1, 10), student_id;
+INSERT INTO daily_class (day, kelas, records, students, first_seen, last_seen)
+    SELECT substr(timestamp, 1, 10), COALESCE(kelas, ''), count(*), count(DISTINCT student_id), min(timestamp), max(timestamp)
+    FROM attendance GROUP BY substr(timestamp, 1, 10), COALESCE(kelas, '');
+"""
+
+
+def _add_rollups(conn):
+    for statement in _statements(ROLLUP_SCHEMA + REBUILD_ROLLUPS):
+        conn.execute(statement)
+
+
+def _statements(script):
+    # Connection.executescript commits first, which would break the migration transaction
+    statements, pending = [], ""
+    for line in script.splitlines(keepends=True):
+        if line.lstrip().startswith("--"):
+            continue
+        pending += line
+        if sqlite3.complete_statement(pending):
+            statements.append(pending.strip())
+            pending = ""
+    return statements
+
+
+def _narrow_students_version_trigger(conn):
+    conn.execute("DROP TRIGGER IF EXISTS students_version_upd")
+    conn.execute("CREATE TRIGGER students_version_upd AFTER UPDATE OF id, nama, kelas, email, nomor_telepon ON students "
+                 "BEGIN UPDATE meta SET value = value + 1 WHERE key = 'students_version'; END")
+
+
+# Applied in order to databases whose schema_version is lower than their position + 1
+MIGRATIONS = [_add_attendance_kelas, _add_rollups, _narrow_students_version_trigger]
+
+# Fixed SQL text, so sqlite3's per-connection statement cache reuses the prepared statements.
+# The class is copied from the student at insert time so history keeps the class it was taken in.
+INSERT_ATTENDANCE = (
+    "INSERT INTO attendance (student_id, name, timestamp, status, kelas) "
+    "VALUES (?, ?, ?, ?, (SELECT kelas FROM students WHERE id = ?))"
+)
+# Counters are bumped in place, writers in other processes hold their own in-memory copies
+UPDATE_COUNTER = (
+    "UPDATE students SET total_kehadiran = total_kehadiran + 1, "
+    "waktu_kehadiran = max(COALESCE(waktu_kehadiran, ''), ?) WHERE id = ?"
+)
+SELECT_COUNTER = "SELECT total_kehadiran, waktu_kehadiran FROM students WHERE id = ?"
+SET_JOURNAL_SEQ = "INSERT INTO meta (key, value) VALUES (?, ?) ON CONFLICT (key) DO UPDATE SET value = excluded.value"
+UPSERT_STUDENT = (
+    "INSERT INTO students (id, nama, kelas, total_kehadiran, email, nomor_telepon, waktu_kehadiran) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+    "nama = excluded.nama, kelas = excluded.kelas, total_kehadiran = excluded.total_kehadiran, "
+    "email = excluded.email, nomor_telepon = excluded.nomor_telepon, waktu_kehadiran = excluded.waktu_kehadiran"
+)
+
+
+def _record(conn, sid, name, timestamp, status, since=None):
+    # Callers hold the write lock, so the stored time cannot move between the check and the insert
+    if since:
+        row = conn.execute(SELECT_COUNTER, (sid,)).fetchone()
+        if row and row["waktu_kehadiran"] and row["waktu_kehadiran"] >= since:
+            return False
+    conn.execute(INSERT_ATTENDANCE, (sid, name, timestamp, status, sid))
+    conn.execute(UPDATE_COUNTER, (timestamp, sid))
+    return True
+
+
+def _student_params(student):
+    values = []
+    for col in STUDENT_COLUMNS:
+        value = student.get(col)
+        values.append(None if value is None or (isinstance(value, float) and value != value) else value)
+    values[0] = int(values[0])
+    values[3] = int(values[3] or 0)
+    return values
+
+
+class SQLiteStorage:
+    """Students and attendance history in one SQLite database running in WAL mode."""
+
+    def __init__(self, path=DB_PATH):
+        self.path = path
+        self._local = threading.local()
+        with self.connection() as conn:
+            conn.executescript(SCHEMA)
+        self.migrate()
+
+    def migrate(self):
+        conn = self.connection()
+        version = conn.execute("SELECT value FROM meta WHERE key = 'schema_version'").fetchone()[0]
+        for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            with conn:
+                migration(conn)
+                conn.execute("UPDATE meta SET value = ? WHERE key = 'schema_version'", (number,))
+            log_message(f"🛠️ Database migrated to schema version {number}")
+
+    def connection(self):
+        # sqlite3 connections are bound to their thread, so keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def is_empty(self):
+        conn = self.connection()
+        return not conn.execute("SELECT 1 FROM students LIMIT 1").fetchone() and \
+            not conn.execute("SELECT 1 FROM attendance LIMIT 1").fetchone()
+
+    # ---------------------- students ----------------------
+
+    def students_version(self):
+        return self.connection().execute("SELECT value FROM meta WHERE key = 'students_version'").fetchone()[0]
+
+    def attendance_seq(self):
+        return self.connection().execute("SELECT COALESCE(max(seq), 0) FROM attendance").fetchone()[0]
+
+    def counters_since(self, seq):
+        """Stored counters of the students with attendance rows after `seq`."""
+        rows = self.connection().execute(
+            "SELECT id, total_kehadiran, waktu_kehadiran FROM students "
+            "WHERE id IN (SELECT student_id FROM attendance WHERE seq > ?)", (seq,))
+        return {str(row["id"]): {"total_kehadiran": row["total_kehadiran"], "waktu_kehadiran": row["waktu_kehadiran"]}
+                for row in rows}
+
+    def student_index(self):
+        rows = self.connection().execute(f"SELECT {', '.join(STUDENT_COLUMNS)} FROM students")
+        return {str(row["id"]): dict(row) for row in rows}
+
+    def students_frame(self):
+        return pd.read_sql_query(f"SELECT {', '.join(STUDENT_COLUMNS)} FROM students ORDER BY id", self.connection())
+
+    def upsert_students(self, students):
+        with self.connection() as conn:
+            conn.executemany(UPSERT_STUDENT, (_student_params(s) for s in students))
+
+    def replace_students(self, df):
+        records = df.reindex(columns=STUDENT_COLUMNS).to_dict("records")
+        with self.connection() as conn:
+            conn.execute("DELETE FROM students")
+            conn.executemany(UPSERT_STUDENT, (_student_params(s) for s in records))
+
+    # ---------------------- attendance ----------------------
+
+    def record_attendance(self, student, status="Present", since=None):
+        """Append one attendance row and bump the student's counter in a single transaction.
+
+        Nothing is written when the stored last attendance is at or after `since`, so
+        another process that already recorded the student wins. The stored counter and
+        time are copied back into `student`; returns whether a row was written.
+        """
+        sid = int(student["id"])
+        with self.connection() as conn:
+            # Take the write lock before reading, the check and the insert must not interleave with another writer
+            conn.execute("BEGIN IMMEDIATE")
+            recorded = _record(conn, sid, student["nama"], student["waktu_kehadiran"], status, since)
+            row = conn.execute(SELECT_COUNTER, (sid,)).fetchone()
+        if row:
+            student["total_kehadiran"], student["waktu_kehadiran"] = row["total_kehadiran"], row["waktu_kehadiran"]
+        return recorded
+
+    def journal_seq(self, key="journal_seq"):
+        row = self.connection().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else 0
+
+    def apply_attendance_events(self, events, journal_seq, key="journal_seq"):
+        """Apply a batch of journal events and advance that journal's checkpoint (meta row `key`) atomically.
+
+        Events are check-ins, not totals: each one bumps the stored counter, unless its
+        `since` shows the student was already recorded in the window. Returns how many
+        were applied.
+        """
+        with self.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            applied = sum(_record(conn, int(e["id"]), e["nama"], e["timestamp"], e["status"], e.get("since")) for e in events)
+            conn.execute(SET_JOURNAL_SEQ, (key, journal_seq))
+        return applied
+
+    def attendance_frame(self):
+        return pd.read_sql_query(
+            "SELECT student_id AS id, name, timestamp, status FROM attendance ORDER BY seq", self.connection()
+        )
+
+    def query_attendance(self, student_id=None, kelas=None, start=None, end=None, cursor=None, limit=100):
+        """One page of attendance rows ordered by (timestamp, seq); returns (rows, next_cursor).
+
+        `start` is inclusive and `end` exclusive, both compared as "YYYY-MM-DD HH:MM:SS"
+        strings. Paging is keyset based, so every page is an index range scan on
+        (student_id, timestamp), (kelas, timestamp) or (timestamp) however deep it goes.
+        """
+        where, params = [], []
+        if student_id is not None:
+            where.append("student_id = ?")
+            params.append(int(student_id))
+        if kelas is not None:
+            where.append("kelas = ?")
+            params.append(kelas)
+        if start:
+            where.append("timestamp >= ?")
+            params.append(start)
+        if end:
+            where.append("timestamp < ?")
+            params.append(end)
+        if cursor:
+            after_ts, after_seq = decode_cursor(cursor)
+            where.append("(timestamp > ? OR (timestamp = ? AND seq > ?))")
+            params += [after_ts, after_ts, after_seq]
+
+        sql = ("SELECT seq, student_id AS id, name, kelas, timestamp, status FROM attendance"
+               + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY timestamp, seq LIMIT ?")
+        rows = [dict(row) for row in self.connection().execute(sql, params + [limit + 1])]
+        next_cursor = encode_cursor(rows[limit - 1]["timestamp"], rows[limit - 1]["seq"]) if len(rows) > limit else None
+        return rows[:limit], next_cursor
+
+    # ---------------------- rollups ----------------------
+
+    def rebuild_rollups(self):
+        """Recompute the daily rollups from the raw attendance history."""
+        with self.connection() as conn:
+            for statement in _statements(REBUILD_ROLLUPS):
+                conn.execute(statement)
+            days = conn.execute("SELECT count(*) FROM daily_student").fetchone()[0]
+        log_message(f"📊 Rebuilt attendance rollups, {days} student-days")
+        return days
+
+    def daily_rollup(self, by="student", student_id=None, kelas=None, start=None, end=None):
+        """Daily rows from daily_student or daily_class, `start` inclusive and `end` exclusive ("YYYY-MM-DD")."""
+        where, params = _day_range("day", start, end)
+        if by == "student" and student_id is not None:
+            where.append("student_id = ?")
+            params.append(int(student_id))
+        if kelas is not None:
+            where.append("kelas = ?")
+            params.append(kelas)
+        table, key = ("daily_student", "student_id AS id, kelas") if by == "student" else ("daily_class", "kelas, students")
+        sql = (f"SELECT day, {key}, records, first_seen, last_seen FROM {table}"
+               + (" WHERE " + " AND ".join(where) if where else "") + " ORDER BY day, 2")
+        return [dict(row) for row in self.connection().execute(sql, params)]
+
+    def attendance_rates(self, by="student", kelas=None, start=None, end=None):
+        """Share of session days (days with any attendance) each student or class was present in [start, end).
+
+        Returns (session_days, rows). A class rate is its present student-days over its
+        current size times the session days.
+        """
+        conn = self.connection()
+        window, window_params = _day_range("day", start, end)
+        sessions = conn.execute(
+            "SELECT count(DISTINCT day) FROM daily_class" + (" WHERE " + " AND ".join(window) if window else ""),
+            window_params
+        ).fetchone()[0]
+
+        join, params = _day_range("d.day", start, end)
+        join = "".join(f" AND {cond}" for cond in join)
+        class_filter = " WHERE COALESCE(s.kelas, '') = ?" if kelas is not None else ""
+        if by == "student":
+            sql = f"""
+                SELECT s.id, s.nama, COALESCE(s.kelas, '') AS kelas, count(d.day) AS days_present,
+                       min(d.first_seen) AS first_seen, max(d.last_seen) AS last_seen
+                FROM students s LEFT JOIN daily_student d ON d.student_id = s.id{join}{class_filter}
+                GROUP BY s.id ORDER BY s.id"""
+            params += [kelas] if kelas is not None else []
+        else:
+            sql = f"""
+                SELECT c.kelas, c.size AS students, COALESCE(sum(d.students), 0) AS days_present,
+                       min(d.first_seen) AS first_seen, max(d.last_seen) AS last_seen
+                FROM (SELECT COALESCE(s.kelas, '') AS kelas, count(*) AS size FROM students s{class_filter} GROUP BY 1) c
+                LEFT JOIN daily_class d ON d.kelas = c.kelas{join}
+                GROUP BY c.kelas ORDER BY c.kelas"""
+            params = ([kelas] if kelas is not None else []) + params
+
+        rows = [dict(row) for row in conn.execute(sql, params)]
+        for row in rows:
+            possible = sessions * (row["students"] if by == "class" else 1)
+            row["rate"] = round(row["days_present"] / possible, 4) if possible else None
+        return sessions, rows
+
+    # ---------------------- migration ----------------------
+
+    def import_csv(self, csv_path=CSV_PATH, attendance_path=ATTENDANCE_PATH):
+        students = pd.read_csv(csv_path, encoding="utf-8") if os.path.exists(csv_path) else pd.DataFrame(columns=STUDENT_COLUMNS)
+        history = pd.read_csv(attendance_path) if os.path.exists(attendance_path) else pd.DataFrame(columns=ATTENDANCE_COLUMNS)
+        history = history.reindex(columns=ATTENDANCE_COLUMNS)
+        history["status"] = history["status"].fillna("Present")
+
+        with self.connection() as conn:
+            conn.execute("DELETE FROM attendance")
+            conn.execute("DELETE FROM daily_class")
+            conn.execute("DELETE FROM daily_student")
+            conn.execute("DELETE FROM students")
+            conn.executemany(UPSERT_STUDENT, (_student_params(s) for s in students.to_dict("records")))
+            conn.executemany(INSERT_ATTENDANCE, (row + (row[0],) for row in history[ATTENDANCE_COLUMNS].itertuples(index=False, name=None)))
+
+        log_message(f"📥 Imported {len(students)} students and {len(history)} attendance rows into {self.path}")
+        return len(students), len(history)
+
+
+def _day_range(column, start, end):
+    where, params = [], []
+    if start:
+        where.append(f"{column} >= ?")
+        params.append(start[:10])
+    if end:
+        where.append(f"{column} < ?")
+        params.append(end[:10])
+    return where, params
+
+
+def encode_cursor(timestamp, seq):
+    return base64.urlsafe_b64encode(f"{timestamp}|{seq}".encode()).decode()
+
+
+def decode_cursor(cursor):
+    try:
+        timestamp, seq = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return timestamp, int(seq)
+    except (ValueError, UnicodeDecodeError):
+        raise ValueError("Invalid cursor")
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+def get_storage():
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                storage = SQLiteStorage(DB_PATH)
+                if storage.is_empty() and (os.path.exists(CSV_PATH) or os.path.exists(ATTENDANCE_PATH)):
+                    storage.import_csv()
+                _storage = storage
+    return _storage
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "import":
+        SQLiteStorage(DB_PATH).import_csv()
+    elif len(sys.argv) > 1 and sys.argv[1] == "rollups":
+        SQLiteStorage(DB_PATH).rebuild_rollups()
+    else:
+        print("Usage: python -m utils.storage import|rollups")
@@ -24,15 +24,20 @@ def add_student(app):
         app.student_df, student_id = add_student_row(app.student_df, app.entries)
 
     folder = Path(IMAGES_DIR) / str(student_id)
-    count = save_faces(student_id, photo_paths, folder, app.log_box)
 
-    if count == 0:
-        messagebox.showerror("Error", "No valid faces found")
-        return
-
-    app.refresh_treeview(app.tree, app.student_df)
-    save_data(app.student_df)
-    log_message(f"🎉 Added {count} images to student ID={student_id}", app.log_box)
+    def done(count, error):
+        # Back on the Tk thread
+        if error:
+            return
+        if count == 0:
+            messagebox.showerror("Error", "No valid faces found")
+            return
+        app.refresh_treeview(app.tree, app.student_df)
+        save_data(app.student_df)
+        log_message(f"🎉 Added {count} images to student ID={student_id}", app.log_box)
+
+    # Face extraction can take a while for many photos, keep the window responsive
+    app.run_in_background("add", lambda: save_faces(student_id, photo_paths, folder, app.log_box), done)
 
 
 def edit_student(app):
@@ -0,0 +1,112 @@
+import itertools
+
+try:
+    from config import TRACK_IOU_THRESHOLD, TRACK_MAX_MISSED, TRACK_RECHECK_FRAMES, TRACK_LOW_CONFIDENCE
+except ImportError:
+    from utils.config import TRACK_IOU_THRESHOLD, TRACK_MAX_MISSED, TRACK_RECHECK_FRAMES, TRACK_LOW_CONFIDENCE
+
+
+def iou(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+def centroid_distance(a, b):
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    return ((ax + aw / 2 - bx - bw / 2) ** 2 + (ay + ah / 2 - by - bh / 2) ** 2) ** 0.5
+
+
+class Track:
+    def __init__(self, track_id, box):
+        self.id = track_id
+        self.box = tuple(int(v) for v in box)
+        self.student = None
+        self.conf = None
+        self.recognized = False
+        self.since_recognition = 0
+        self.missed = 0
+
+    def set_identity(self, student, conf):
+        """Store a recognition result; returns True when the identity changed."""
+        changed = not self.recognized or (student or {}).get("id") != (self.student or {}).get("id")
+        self.student, self.conf = student, conf
+        self.recognized = True
+        self.since_recognition = 0
+        return changed
+
+
+class FaceTracker:
+    """Associates detector boxes across frames so each face is recognized once, not every frame.
+
+    Boxes are matched greedily to existing tracks by IoU, falling back to centroid
+    distance for fast movement. A track is sent back to the recognizer when it is new,
+    when its last match was weak (LBPH distance above `low_confidence`) or every
+    `recheck_frames` frames.
+    """
+
+    def __init__(self, iou_threshold=TRACK_IOU_THRESHOLD, max_missed=TRACK_MAX_MISSED,
+                 recheck_frames=TRACK_RECHECK_FRAMES, low_confidence=TRACK_LOW_CONFIDENCE):
+        self.iou_threshold = iou_threshold
+        self.max_missed = max_missed
+        self.recheck_frames = recheck_frames
+        self.low_confidence = low_confidence
+        self.tracks = []
+        self._ids = itertools.count(1)
+
+    def _associate(self, boxes):
+        pairs = []
+        for ti, track in enumerate(self.tracks):
+            for bi, box in enumerate(boxes):
+                overlap = iou(track.box, box)
+                if overlap >= self.iou_threshold:
+                    pairs.append((overlap, ti, bi))
+                elif centroid_distance(track.box, box) < 0.5 * max(track.box[2], track.box[3]):
+                    pairs.append((overlap - 1.0, ti, bi))
+
+        matches, used_tracks, used_boxes = {}, set(), set()
+        for _, ti, bi in sorted(pairs, reverse=True):
+            if ti in used_tracks or bi in used_boxes:
+                continue
+            matches[bi] = self.tracks[ti]
+            used_tracks.add(ti)
+            used_boxes.add(bi)
+        return matches
+
+    def update(self, boxes):
+        """Advance one frame; returns the track for each box, in box order."""
+        boxes = [tuple(int(v) for v in box) for box in boxes]
+        matches = self._associate(boxes)
+
+        result = []
+        for bi, box in enumerate(boxes):
+            track = matches.get(bi)
+            if track is None:
+                track = Track(next(self._ids), box)
+                self.tracks.append(track)
+            else:
+                track.box = box
+                track.missed = 0
+                track.since_recognition += 1
+            result.append(track)
+
+        seen = set(id(t) for t in result)
+        for track in self.tracks:
+            if id(track) not in seen:
+                track.missed += 1
+        self.tracks = [t for t in self.tracks if t.missed <= self.max_missed]
+        return result
+
+    def needs_recognition(self, track):
+        if not track.recognized or track.since_recognition >= self.recheck_frames:
+            return True
+        return track.conf is None or track.conf >= self.low_confidence
+
+    def reset(self):
+        self.tracks = []
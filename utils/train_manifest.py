@@ -0,0 +1,95 @@
+import hashlib, json, os
+
+try:
+    from config import IMAGES_DIR
+except ImportError:
+    from utils.config import IMAGES_DIR
+
+
+def content_hash(data: bytes) -> str:
+    return hashlib.sha1(data).hexdigest()
+
+
+def scan_images(images_dir=IMAGES_DIR):
+    """Every enrolled image as (path, label), in a stable order."""
+    items = []
+    for student_id in sorted(os.listdir(images_dir)):
+        folder = os.path.join(images_dir, student_id)
+        if not os.path.isdir(folder):
+            continue
+        for img_name in sorted(os.listdir(folder)):
+            items.append((os.path.join(folder, img_name), int(student_id)))
+    return items
+
+
+def make_record(path, label, data=None):
+    st = os.stat(path)
+    if data is None:
+        with open(path, "rb") as f:
+            data = f.read()
+    return {"path": path, "label": label, "hash": content_hash(data), "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+class TrainingManifest:
+    """Which image produced each row of the trained model, so retraining only touches what changed.
+
+    `entries` follows the model's row order. Images without a usable face are kept in
+    `skipped` so they are not decoded again until the file changes.
+    """
+
+    def __init__(self, params, entries=None, skipped=None):
+        self.params = params
+        self.entries = entries or []
+        self.skipped = skipped or {}
+
+    @classmethod
+    def load(cls, path, params):
+        try:
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("params") != params:
+            return None
+        return cls(params, data.get("entries", []), data.get("skipped", {}))
+
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"params": self.params, "entries": self.entries, "skipped": self.skipped}, f)
+        os.replace(tmp_path, path)
+
+    @staticmethod
+    def _unchanged(record, path, label):
+        if record is None or record["label"] != label:
+            return False
+        st = os.stat(path)
+        if (st.st_size, st.st_mtime_ns) == (record["size"], record["mtime_ns"]):
+            return True
+        # Touched but possibly identical, e.g. copied back from a backup
+        fresh = make_record(path, label)
+        if fresh["hash"] != record["hash"]:
+            return False
+        record.update(size=fresh["size"], mtime_ns=fresh["mtime_ns"])
+        return True
+
+    def plan(self, images):
+        """Split current images into model rows to keep and (path, label) pairs to process.
+
+        Returns (keep_rows, kept_entries, kept_skipped, todo); rows of removed or changed
+        images are simply absent from keep_rows.
+        """
+        by_path = {entry["path"]: (row, entry) for row, entry in enumerate(self.entries)}
+        keep_rows, kept_entries, kept_skipped, todo = [], [], {}, []
+
+        for path, label in images:
+            row, entry = by_path.get(path, (None, None))
+            if entry is not None and self._unchanged(entry, path, label):
+                keep_rows.append(row)
+                kept_entries.append(entry)
+            elif self._unchanged(self.skipped.get(path), path, label):
+                kept_skipped[path] = self.skipped[path]
+            else:
+                todo.append((path, label))
+
+        return keep_rows, kept_entries, kept_skipped, todo
@@ -1,23 +1,31 @@
 import tkinter as tk
 from tkinter import ttk, filedialog, messagebox
 from pathlib import Path
-import sys, os
+import sys, os, threading
+from datetime import datetime, timedelta
 from PIL import Image, ImageTk
+import pandas as pd
 
 try:
-    from config import LOG_PATH, IMAGES_DIR, LOGS_DIR
-    from data_manager import load_data, load_attendance, save_data
+    from config import LOG_PATH, IMAGES_DIR, LOGS_DIR, HISTORY_TAB_DAYS, HISTORY_TAB_PAGE_SIZE
+    from data_manager import load_data, save_data, query_attendance, attendance_rollup, attendance_rates
     from student_ops import add_student, edit_student, delete_student
     from face_utils import train_model
-    from logger import log_message
+    from logger import log_message, attach_log_box
     from exceptions import set_log_box
+    from snapshots import find_snapshot
 except ImportError:
-    from utils.config import LOG_PATH, IMAGES_DIR, LOGS_DIR
-    from utils.data_manager import load_data, load_attendance, save_data
+    from utils.config import LOG_PATH, IMAGES_DIR, LOGS_DIR, HISTORY_TAB_DAYS, HISTORY_TAB_PAGE_SIZE
+    from utils.data_manager import load_data, save_data, query_attendance, attendance_rollup, attendance_rates
     from utils.student_ops import add_student, edit_student, delete_student
     from utils.face_utils import train_model
-    from utils.logger import log_message
+    from utils.logger import log_message, attach_log_box
     from utils.exceptions import set_log_box
+    from utils.snapshots import find_snapshot
+
+
+REPORT_VIEWS = ["Rate per student", "Rate per class", "Daily per class"]
+HISTORY_COLUMNS = ["id", "name", "date", "status"]
 
 
 def search_dataframe(df, query: str):
@@ -37,7 +45,13 @@ class StudentManagerApp:
         self.root.configure(bg="#f5f6fa")
 
         self.student_df = load_data()
-        self.attendance_df = load_attendance()
+        self.attendance_df = pd.DataFrame(columns=HISTORY_COLUMNS)
+        self.report_df = pd.DataFrame()
+        # Date filter shared by the history and report tabs; "To" is inclusive
+        self.range_from = tk.StringVar(value=(datetime.now() - timedelta(days=HISTORY_TAB_DAYS)).strftime("%Y-%m-%d"))
+        self.range_to = tk.StringVar(value="")
+        self.history_cursor = None
+        self.history_info = None
 
         self.entries = {}
         self.label_widgets = {}
@@ -45,6 +59,8 @@ class StudentManagerApp:
         self.image_label = None
         self.tree = None
         self.history_tree = None
+        self.report_tree = None
+        self.report_view = None
         self.log_box = None
         self.search_entry = None
         self.notebook = None
@@ -57,7 +73,7 @@ class StudentManagerApp:
         self.build_log()
 
         self.refresh_treeview(self.tree, self.student_df)
-        self.refresh_treeview(self.history_tree, self.attendance_df)
+        self.load_history()
         log_message("🚀 Program started", self.log_box)
         set_log_box(self.log_box)
 
@@ -151,7 +167,7 @@ class StudentManagerApp:
             "add": ("➕ Add (Select Photos)", lambda: add_student(self), "#3498db"),
             "edit": ("✏️ Edit", lambda: edit_student(self), "#f39c12"),
             "delete": ("🗑 Delete", lambda: delete_student(self), "#e74c3c"),
-            "train": ("🧠 Train Model", lambda: train_model(self.log_box), "#27ae60"),
+            "train": ("🧠 Train Model", self.train_in_background, "#27ae60"),
         }
 
         for i, (key, (text, cmd, bg)) in enumerate(specs.items()):
@@ -164,6 +180,38 @@ class StudentManagerApp:
             btn.grid(row=row, column=col, padx=10, pady=8, sticky="ew")
             self.buttons[key] = btn
 
+    def run_in_background(self, button, work, on_done=None, poll=100):
+        """Run work() on a worker thread with `button` disabled.
+
+        The worker never touches Tk: it only logs (the log box is fed from the Tk thread)
+        and the Tk thread polls for the outcome, then calls on_done(result, error).
+        """
+        self.buttons[button].config(state="disabled")
+        outcome = {}
+
+        def target():
+            try:
+                outcome["result"] = work()
+            except Exception as e:
+                outcome["error"] = e
+                log_message(f"❌ {e}", self.log_box, level="ERROR")
+
+        thread = threading.Thread(target=target, daemon=True)
+        thread.start()
+
+        def check():
+            if thread.is_alive():
+                self.root.after(poll, check)
+                return
+            self.buttons[button].config(state="normal")
+            if on_done:
+                on_done(outcome.get("result"), outcome.get("error"))
+
+        self.root.after(poll, check)
+
+    def train_in_background(self):
+        self.run_in_background("train", lambda: train_model(self.log_box))
+
     def build_search(self):
         search_frame = tk.LabelFrame(
             self.root, text="Search Student", padx=10, pady=10,
@@ -201,14 +249,30 @@ class StudentManagerApp:
         history_tab = tk.Frame(self.notebook, bg="#f5f6fa")
         self.notebook.add(history_tab, text="🕒 Attendance History")
 
-        hist_cols = ["id", "name", "date", "status"]
-        self.history_tree = ttk.Treeview(history_tab, columns=hist_cols, show="headings", height=12)
-        for col in hist_cols:
+        history_bar = self.build_range_filter(history_tab)
+        self.buttons["more"] = ttk.Button(history_bar, text="Load more", command=lambda: self.load_history(more=True))
+        self.buttons["more"].pack(side="left", padx=5)
+        self.history_info = tk.Label(history_bar, bg="#f5f6fa", fg="#555")
+        self.history_info.pack(side="left", padx=5)
+
+        self.history_tree = ttk.Treeview(history_tab, columns=HISTORY_COLUMNS, show="headings", height=11)
+        for col in HISTORY_COLUMNS:
             self.history_tree.heading(col, text=col)
             self.history_tree.column(col, anchor="center", stretch=True)
         self.history_tree.pack(fill="both", expand=True)
         self.history_tree.bind("<<TreeviewSelect>>", self.on_history_select)
 
+        report_tab = tk.Frame(self.notebook, bg="#f5f6fa")
+        self.notebook.add(report_tab, text="📊 Reports")
+
+        report_bar = self.build_range_filter(report_tab)
+        self.report_view = ttk.Combobox(report_bar, values=REPORT_VIEWS, state="readonly", width=20)
+        self.report_view.current(0)
+        self.report_view.pack(side="left", padx=5)
+        self.report_view.bind("<<ComboboxSelected>>", lambda e: self.load_report())
+        self.report_tree = ttk.Treeview(report_tab, show="headings", height=11)
+        self.report_tree.pack(fill="both", expand=True)
+
         self.notebook.bind("<<NotebookTabChanged>>", self.on_tab_change)
 
     def build_log(self):
@@ -220,6 +284,74 @@ class StudentManagerApp:
 
         self.log_box = tk.Text(log_frame, height=6, wrap="word", bg="black", fg="lime", font=("Consolas", 10))
         self.log_box.pack(fill="both", expand=True)
+        attach_log_box(self.log_box)
+
+    def build_range_filter(self, parent):
+        bar = tk.Frame(parent, bg="#f5f6fa")
+        bar.pack(fill="x", pady=(0, 5))
+        tk.Label(bar, text="From", bg="#f5f6fa").pack(side="left")
+        ttk.Entry(bar, textvariable=self.range_from, width=11).pack(side="left", padx=(2, 8))
+        tk.Label(bar, text="To", bg="#f5f6fa").pack(side="left")
+        ttk.Entry(bar, textvariable=self.range_to, width=11).pack(side="left", padx=2)
+        ttk.Button(bar, text="Apply", command=self.apply_range).pack(side="left", padx=5)
+        return bar
+
+    def date_range(self):
+        """(start, end) for the storage queries from the From/To fields, None when a field is not a YYYY-MM-DD date."""
+        start, end = self.range_from.get().strip(), self.range_to.get().strip()
+        try:
+            if start:
+                datetime.strptime(start, "%Y-%m-%d")
+            if end:
+                # The field is inclusive, the queries take an exclusive end
+                end = (datetime.strptime(end, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+        except ValueError:
+            messagebox.showerror("Error", "Dates must be YYYY-MM-DD (leave empty for no limit)")
+            return None
+        return start or None, end or None
+
+    def apply_range(self):
+        if self.date_range() is None:
+            return
+        self.load_history()
+        if self.notebook.tab(self.notebook.select(), "text") == "📊 Reports":
+            self.load_report()
+
+    def load_history(self, more=False):
+        # One keyset page at a time, "Load more" continues after the last row shown
+        date_range = self.date_range()
+        if date_range is None:
+            return
+        start, end = date_range
+        rows, self.history_cursor = query_attendance(start=start, end=end, cursor=self.history_cursor if more else None,
+                                                     limit=HISTORY_TAB_PAGE_SIZE)
+        page = pd.DataFrame([(r["id"], r["name"], r["timestamp"], r["status"]) for r in rows], columns=HISTORY_COLUMNS)
+        self.attendance_df = pd.concat([self.attendance_df, page], ignore_index=True) if more else page
+        self.refresh_treeview(self.history_tree, self.attendance_df)
+
+        shown = f"{len(self.attendance_df)} record(s) from {start or 'the beginning'}"
+        if end:
+            shown += f" to {self.range_to.get().strip()}"
+        self.history_info.config(text=shown + (", more available" if self.history_cursor else ""))
+        self.buttons["more"].config(state="normal" if self.history_cursor else "disabled")
+
+    def load_report(self):
+        # Rollups are maintained on every attendance write, so this stays cheap however long the history gets
+        date_range = self.date_range()
+        if date_range is None:
+            return
+        start, end = date_range
+        view = self.report_view.get()
+        if view == "Daily per class":
+            rows = attendance_rollup("class", start=start, end=end)
+        else:
+            _, rows = attendance_rates("class" if view == "Rate per class" else "student", start=start, end=end)
+        self.report_df = pd.DataFrame(rows)
+        self.report_tree["columns"] = list(self.report_df.columns)
+        for col in self.report_df.columns:
+            self.report_tree.heading(col, text=col)
+            self.report_tree.column(col, anchor="center", stretch=True, width=120)
+        self.refresh_treeview(self.report_tree, self.report_df)
 
     def refresh_treeview(self, tree, df):
         tree.delete(*tree.get_children())
@@ -247,11 +379,11 @@ class StudentManagerApp:
 
         values = self.history_tree.item(selected)["values"]
         student_id, date = values[0], values[2]
-        filename = f"{student_id}-{date.replace('-','').replace(':','').replace(' ','')}.png"
-        img_path = Path(LOGS_DIR) / filename
+        filename = f"{student_id}-{date.replace('-','').replace(':','').replace(' ','')}"
+        img_path = find_snapshot(LOGS_DIR, filename)
 
-        if not img_path.exists():
-            log_message(f"❌ Image not found: {img_path}", self.log_box)
+        if img_path is None:
+            log_message(f"❌ Image not found: {Path(LOGS_DIR) / filename}.*", self.log_box)
             return
 
         try:
@@ -287,6 +419,10 @@ class StudentManagerApp:
             self.refresh_treeview(self.tree, self.student_df)
             for btn in ["add", "edit", "delete"]:
                 self.buttons[btn].config(state="normal")
+        elif tab == "📊 Reports":
+            self.load_report()
+            for btn in ["add", "edit", "delete"]:
+                self.buttons[btn].config(state="disabled")
         else:
             self.refresh_treeview(self.history_tree, self.attendance_df)
             for btn in ["add", "edit", "delete"]:
@@ -298,6 +434,9 @@ class StudentManagerApp:
         if tab == "📋 Students":
             filtered = search_dataframe(self.student_df, query)
             self.refresh_treeview(self.tree, filtered)
+        elif tab == "📊 Reports":
+            filtered = search_dataframe(self.report_df, query)
+            self.refresh_treeview(self.report_tree, filtered)
         else:
             filtered = search_dataframe(self.attendance_df, query)
             self.refresh_treeview(self.history_tree, filtered)
@@ -307,6 +446,8 @@ class StudentManagerApp:
         tab = self.notebook.tab(self.notebook.select(), "text")
         if tab == "📋 Students":
             self.refresh_treeview(self.tree, self.student_df)
+        elif tab == "📊 Reports":
+            self.refresh_treeview(self.report_tree, self.report_df)
         else:
             self.refresh_treeview(self.history_tree, self.attendance_df)
 
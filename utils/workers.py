@@ -0,0 +1,102 @@
+import asyncio, math, threading, time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+
+class QueueFullError(Exception):
+    def __init__(self, name, retry_after):
+        super().__init__(f"{name} queue is full, retry in {retry_after}s")
+        self.retry_after = retry_after
+
+
+def _timed_call(fn, args, kwargs):
+    # Runs in the worker, wall clock so the start time is comparable across processes
+    return time.time(), fn(*args, **kwargs)
+
+
+class BoundedExecutor:
+    """Thread or process pool with a fixed number of queue slots for use from asyncio handlers.
+
+    At most `workers` jobs run and `max_queue` more may wait; anything beyond that is
+    rejected right away with QueueFullError instead of piling up behind the pool.
+    """
+
+    def __init__(self, name, workers=2, max_queue=32, kind="thread"):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.kind = kind
+
+        if kind == "process":
+            self._executor = ProcessPoolExecutor(max_workers=workers)
+        else:
+            self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.failed = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.total_service = 0.0
+
+    def retry_after(self):
+        with self._lock:
+            avg_service = self.total_service / self.completed if self.completed else 1.0
+            backlog = max(1, self.in_flight - self.workers + 1)
+        return max(1, math.ceil(avg_service * backlog / self.workers))
+
+    async def run(self, fn, *args, **kwargs):
+        if not self._slots.acquire(blocking=False):
+            with self._lock:
+                self.rejected += 1
+            raise QueueFullError(self.name, self.retry_after())
+
+        with self._lock:
+            self.in_flight += 1
+        submitted = time.time()
+
+        try:
+            future = self._executor.submit(_timed_call, fn, args, kwargs)
+        except Exception:
+            self._finished(None, submitted)
+            raise
+        # The slot belongs to the job, not to the awaiting request: a cancelled request
+        # leaves the job running, and it must keep counting against the queue bound
+        future.add_done_callback(lambda f: self._finished(f, submitted))
+        started, result = await asyncio.wrap_future(future)
+        return result
+
+    def _finished(self, future, submitted):
+        finished = time.time()
+        with self._lock:
+            self.in_flight -= 1
+            if future is None or future.cancelled() or future.exception() is not None:
+                self.failed += 1
+            else:
+                started = future.result()[0]
+                wait = max(0.0, started - submitted)
+                self.completed += 1
+                self.total_wait += wait
+                self.max_wait = max(self.max_wait, wait)
+                self.total_service += finished - started
+        self._slots.release()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "kind": self.kind,
+                "workers": self.workers,
+                "capacity": self.workers + self.max_queue,
+                "in_flight": self.in_flight,
+                "queued": max(0, self.in_flight - self.workers),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "failed": self.failed,
+                "avg_wait_ms": round(1000 * self.total_wait / self.completed, 2) if self.completed else 0.0,
+                "max_wait_ms": round(1000 * self.max_wait, 2),
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)